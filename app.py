@@ -22,7 +22,7 @@ from blacksmith.scrape import Scraper
 #$     scraper = Scraper()
 #$     await scraper.scrape_content(prompt)
 #$     print(scraper.state.body_content)
-#$     scraper.close()
+#$     await scraper.close()
 #$ 
 #$ asyncio.run(main())
 
@@ -0,0 +1,94 @@
+"""Hit rate and latency of deployed-model completions with and without the completion cache.
+
+Replays a chatbot workload: questions drawn from a small pool with a Zipf-like
+skew ("Who are you?" is asked far more often than anything else), each asked
+with varying case and punctuation and, for --typo-fraction of them, a
+transposed letter. The model is simulated with a fixed --latency.
+
+    no cache     every question goes to the model
+    exact        the exact tier only
+    similar      the exact tier plus the similarity tier, with HashingEmbedder
+
+    python -m benchmarks.completion_cache --requests 500 --threshold 0.7
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from blacksmith.deploy import CompletionCache, Deployment, InferenceRouter
+from blacksmith.deploy.cache import HashingEmbedder
+from blacksmith.metrics import Metrics
+
+QUESTIONS = [
+    "Who are you?",
+    "What do you do for a living?",
+    "Where do you live?",
+    "What is your favourite case?",
+    "How did you know I had been in Afghanistan?",
+    "Do you play any instruments?",
+    "Who is your closest friend?",
+    "What do you think of Scotland Yard?",
+    "What is the science of deduction?",
+    "Have you ever been wrong?",
+    "Who is Moriarty?",
+    "Why do you smoke a pipe?",
+]
+
+class ModelBackend:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, model: str, messages: list, **params) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency * random.uniform(0.8, 1.2))
+        return f"Elementary: {messages[-1]['content']}"
+
+def workload(requests: int, typo_fraction: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    questions = []
+    for question in rng.choices(QUESTIONS, weights, k=requests):
+        question = rng.choice([question, question.lower(), question.rstrip("?"), question + "!"])
+        if rng.random() < typo_fraction:
+            i = rng.randrange(1, len(question) - 2)
+            question = question[:i] + question[i + 1] + question[i] + question[i + 2:]
+        questions.append(question)
+    return questions
+
+async def run(args):
+    deployment = Deployment("gpt", "ft:benchmark", "You are Sherlock Holmes.")
+    questions = workload(args.requests, args.typo_fraction)
+    modes = [
+        ("no cache", None),
+        ("exact", CompletionCache()),
+        ("similar", CompletionCache(embedder=HashingEmbedder(), threshold=args.threshold)),
+    ]
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'calls':>6} {'hit rate':>9} {'saved s':>8}")
+    for name, cache in modes:
+        random.seed(0)
+        backend = ModelBackend(args.latency)
+        router = InferenceRouter(backends={"gpt": backend}, hedge_after=None, cache=cache)
+        ms = []
+        # Sequential per client, as a chat user waits for each answer
+        for question in questions:
+            start = time.perf_counter()
+            await router.complete(deployment, question, cache=cache is not None)
+            ms.append((time.perf_counter() - start) * 1000)
+        stats = cache.stats() if cache is not None else {"hit_rate": 0.0, "seconds_saved": 0.0}
+        p50, p95 = (Metrics.percentile(ms, q) for q in (0.5, 0.95))
+        print(f"{name:<10} {p50:>8.1f} {p95:>8.1f} {sum(ms) / len(ms):>8.1f} {backend.calls:>6} "
+              f"{stats['hit_rate']:>9.2f} {stats['seconds_saved']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated model latency in seconds")
+    parser.add_argument("--typo-fraction", type=float, default=0.1)
+    parser.add_argument("--threshold", type=float, default=0.7, help="cosine similarity for the similarity tier")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Prompt tokens spent on page context per saved page, before and after PageCondenser.
+
+For each page, compares what the prompts used to include with the outline
+that replaces it:
+
+    raw html     the first 5000 characters of page source (scraping2)
+    think        the repr of the page's headers, which think included twice
+    summary      the outline without its elements, which think now uses
+    plan         the headers plus up to 40 links and 20 inputs (plan, get_action)
+    outline      PageCondenser's full outline, which plan, get_action and
+                 scraping2 now use
+
+Tokens are counted with tiktoken when it's installed and estimated from the
+character count otherwise.
+
+    python -m benchmarks.condense_pages [--pages DIR] [--max-tokens N] [--repeat N]
+"""
+import argparse
+import os
+import time
+
+from benchmarks.parse_pages import PAGES_DIR, load_pages
+
+from blacksmith.scrape.chunking import estimate_tokens
+from blacksmith.scrape.condense import PageCondenser
+from blacksmith.scrape.document import ParsedPage
+from blacksmith.scrape.scraping import Header
+
+def token_counter():
+    try:
+        import tiktoken
+    except ImportError:
+        return estimate_tokens, "estimated"
+    encoding = tiktoken.get_encoding("o200k_base")
+    return (lambda text: len(encoding.encode(text))), "tiktoken"
+
+def old_targets(page: ParsedPage, max_links: int = 40, max_inputs: int = 20) -> str:
+    """The link and input listing plan and get_action used before outlines."""
+    links = "\n".join(f"- {text}: {url}" for text, url in page.links()[:max_links])
+    inputs = []
+    for element in page.soup.find_all(['input', 'textarea', 'button']):
+        if element.get('type') == 'hidden' or not (element.get('id') or element.get('name')):
+            continue
+        selector = f"#{element['id']}" if element.get('id') else f"{element.name}[name=\"{element['name']}\"]"
+        label = element.get('aria-label') or element.get('placeholder') or element.get('value') or " ".join(element.text.split())
+        inputs.append(f"- {selector}: {element.name} {label}".strip())
+    inputs = "\n".join(inputs[:max_inputs])
+    return f"LINKS ON THIS PAGE:\n{links or '(none)'}\nINPUTS ON THIS PAGE:\n{inputs or '(none)'}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=PAGES_DIR)
+    parser.add_argument("--max-tokens", type=int, default=600, help="PageCondenser budget")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    count, method = token_counter()
+    condenser = PageCondenser(max_tokens=args.max_tokens)
+    print(f"tokens {method}, outline budget {args.max_tokens}")
+    print(f"{'page':<48} {'raw html':>9} {'think':>7} {'summary':>8} {'plan':>7} {'outline':>8} {'elements':>9} {'ms':>7}")
+    for url, page_source in load_pages(args.pages).items():
+        # Parsed once up front, as the scraper shares one parse between extraction and condensing
+        page = ParsedPage(url, page_source)
+        header = repr(Header(url=url, headers=page.headers()))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outline = condenser.condense(page)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{url:<48} {count(page_source[:5000]):>9} {2 * count(header):>7} {count(outline.render(elements=False)):>8} "
+              f"{count(header + old_targets(page)):>7} "
+              f"{count(outline.render()):>8} {f'{len(outline.shown)}/{len(outline.elements)}':>9} {elapsed * 1000:>7.1f}")
+
+if __name__ == "__main__":
+    main()
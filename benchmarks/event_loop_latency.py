@@ -0,0 +1,90 @@
+"""Measure how responsive the FastAPI app stays while scrapes are running.
+
+Runs N concurrent `Scraper.scrape_content` jobs against fake (blocking) browsers
+and a fake LLM, while repeatedly requesting a cheap endpoint of the app in the
+same event loop. The browsers serve the recorded pages in benchmarks/fixtures/pages,
+so each step parses and condenses a real page. If scraping blocks the loop,
+endpoint latency grows with N.
+
+    python -m benchmarks.event_loop_latency --scrapes 0 4 16
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from types import SimpleNamespace
+
+from benchmarks.fakes import FakeBrowserPool, FakeDriver, offline_http
+from benchmarks.parse_pages import PAGES_DIR, load_pages
+
+import httpx
+from blacksmith.llm import FakeBackend, LLMGateway, fake_completion, set_default_llm_gateway
+from blacksmith.parse import Prompt, MlModel
+from blacksmith.scrape import scraping
+from blacksmith.scrape.fetch import PageFetcher
+from blacksmith.backend.server import app
+
+PAGES = load_pages(PAGES_DIR)
+# Each navigation goes to the next recorded page
+NEXT_URLS = itertools.cycle(PAGES)
+
+def respond(kwargs: dict):
+    prompt = kwargs["messages"][0]["content"]
+    if "web automation strategist" in prompt:
+        return "NOT_DONE: keep browsing"
+    if "Choose the next browser action" in prompt:
+        return fake_completion(tool_calls=[SimpleNamespace(function=SimpleNamespace(
+            name="browser_action", arguments=json.dumps({"action": "navigate", "url": next(NEXT_URLS)})))])
+    return "summary"
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/openapi.json")
+        await asyncio.sleep(interval)
+        # Include any oversleep: a blocked loop delays the next request as much as it slows this one
+        latencies.append(time.perf_counter() - start - interval)
+    return latencies
+
+async def run(scrapes: int, attempts: int, interval: float) -> list:
+    pool = FakeBrowserPool(size=max(scrapes, 1), driver_factory=lambda: FakeDriver(PAGES))
+    prompt = Prompt(model_type=MlModel.Gpt, data_type="text", webscraping_prompt="benchmark")
+    # Nothing is served over HTTP, so every page goes through the (blocking) fake browser
+    fetcher = PageFetcher(http=offline_http())
+    scrapers = [scraping.Scraper(max_attempts=attempts, browser_pool=pool, fetcher=fetcher) for _ in range(scrapes)]
+
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await client.get("/openapi.json")
+        prober = asyncio.create_task(probe(client, stop, interval))
+        if scrapers:
+            await asyncio.gather(*(scraper.scrape_content(prompt) for scraper in scrapers))
+        else:
+            await asyncio.sleep(1)
+        stop.set()
+        latencies = await prober
+    pool.close()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scrapes", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--attempts", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    set_default_llm_gateway(LLMGateway(backend=FakeBackend(respond)))
+
+    print(f"{'scrapes':>8} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for scrapes in args.scrapes:
+        latencies = asyncio.run(run(scrapes, args.attempts, args.interval))
+        ms = sorted(l * 1000 for l in latencies)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"{scrapes:>8} {len(ms):>9} {statistics.median(ms):>8.2f} {p95:>8.2f} {ms[-1]:>8.2f}")
+
+if __name__ == "__main__":
+    main()
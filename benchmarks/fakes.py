@@ -0,0 +1,82 @@
+"""Local stand-ins for Chrome and the web used by the benchmarks.
+
+The LLM is faked with `blacksmith.llm.FakeBackend`.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("BLACKSMITH_CACHE_DIR", tempfile.mkdtemp(prefix="blacksmith-bench-cache-"))
+
+import httpx
+from blacksmith.scrape.browser_pool import BrowserPool, PooledBrowser
+from blacksmith.scrape.http_pool import HttpClient
+
+class FakeDriver:
+    """A blocking stand-in for a Selenium Chrome driver.
+
+    Every call sleeps for a fixed time, the way the real driver blocks while it
+    talks to Chrome, so benchmarks see the same event-loop behaviour without a
+    browser installed.
+    """
+
+    def __init__(self, pages: Optional[dict] = None, get_latency: float = 0.3, read_latency: float = 0.02):
+        self.pages = pages or {}
+        self.get_latency = get_latency
+        self.read_latency = read_latency
+        self.current_url = "about:blank"
+        self.window_handles = ["main"]
+        self.switch_to = SimpleNamespace(window=lambda handle: None)
+
+    def get(self, url: str):
+        time.sleep(self.get_latency)
+        self.current_url = url
+
+    @property
+    def page_source(self) -> str:
+        time.sleep(self.read_latency)
+        return self.pages.get(self.current_url, "<html><body><h1>Benchmark page</h1></body></html>")
+
+    def execute_script(self, script: str, *args):
+        if "readyState" in script:
+            return "complete"
+        return 1
+
+    def execute_cdp_cmd(self, cmd: str, params: dict):
+        return {}
+
+    def delete_all_cookies(self):
+        pass
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+class FakeBrowserPool(BrowserPool):
+    """A BrowserPool that hands out FakeDrivers instead of launching Chrome."""
+
+    def __init__(self, size: int = 4, driver_factory: Callable[[], FakeDriver] = FakeDriver, **kwargs):
+        super().__init__(size=size, **kwargs)
+        self.driver_factory = driver_factory
+
+    def _launch(self) -> PooledBrowser:
+        return PooledBrowser(self.driver_factory(), profile_dir="", executor=self.executor)
+
+def offline_http(pages: Optional[dict] = None, latency: float = 0.0) -> HttpClient:
+    """An HttpClient that serves `pages` (url -> body) locally and 404s everything else."""
+    pages = pages or {}
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        body = pages.get(str(request.url))
+        if body is None:
+            return httpx.Response(404)
+        return httpx.Response(200, text=body)
+
+    return HttpClient(transport=httpx.MockTransport(handle), retries=0)
@@ -0,0 +1,74 @@
+"""Tail latency of the inference router with and without hedging, and batching vs one-by-one.
+
+The backend is simulated: most completions take --latency seconds, but a
+--slow-fraction of them take --slow-latency instead, the long tail that
+hedged requests are meant to cut off. A hedge only goes out when the model
+has a free slot, so it needs --concurrency above the requests in flight.
+
+    python -m benchmarks.inference --requests 200 --concurrency 64 --hedge-after 0.3
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from blacksmith.deploy import Deployment, InferenceRouter
+from blacksmith.metrics import Metrics
+
+class TailBackend:
+    def __init__(self, latency: float, slow_latency: float, slow_fraction: float):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_fraction = slow_fraction
+        self.calls = 0
+
+    async def complete(self, model: str, messages: list, **params) -> str:
+        self.calls += 1
+        slow = random.random() < self.slow_fraction
+        await asyncio.sleep(self.slow_latency if slow else self.latency * random.uniform(0.8, 1.2))
+        return f"answer to {messages[-1]['content']}"
+
+async def timed_requests(router: InferenceRouter, deployment: Deployment, requests: int) -> list:
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        await router.complete(deployment, f"prompt {i}")
+        return time.perf_counter() - start
+    return await asyncio.gather(*(one(i) for i in range(requests)))
+
+async def run(args):
+    deployment = Deployment("gpt", "ft:benchmark", "You are a benchmark.")
+    print(f"{'mode':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls':>6}")
+    for name, hedge_after in [("no hedging", None), (f"hedge @ {args.hedge_after:g}s", args.hedge_after)]:
+        random.seed(0)
+        backend = TailBackend(args.latency, args.slow_latency, args.slow_fraction)
+        router = InferenceRouter(backends={"gpt": backend}, max_concurrency=args.concurrency, hedge_after=hedge_after)
+        ms = [latency * 1000 for latency in await timed_requests(router, deployment, args.requests)]
+        p50, p95, p99 = (Metrics.percentile(ms, q) for q in (0.5, 0.95, 0.99))
+        print(f"{name:<16} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {backend.calls:>6}")
+
+    # Half the prompts repeat, as when a client re-asks the same questions in one batch
+    prompts = [f"prompt {i % (args.requests // 2)}" for i in range(args.requests)]
+    backend = TailBackend(args.latency, args.latency, 0)
+    router = InferenceRouter(backends={"gpt": backend}, max_concurrency=args.concurrency, hedge_after=None)
+    start = time.perf_counter()
+    for prompt in prompts:
+        await router.complete(deployment, prompt)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    await router.complete_many(deployment, prompts)
+    batched = time.perf_counter() - start
+    print(f"{len(prompts)} prompts one by one: {sequential:.2f}s, as one batch: {batched:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--hedge-after", type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Time header + body parsing per page over saved pages.
+
+Compares the old two-parse html.parser path against a single shared
+ParsedPage with each available BeautifulSoup backend.
+
+    python -m benchmarks.parse_pages [--pages DIR] [--repeat N]
+"""
+import argparse
+import json
+import os
+import time
+
+from bs4 import BeautifulSoup
+from blacksmith.scrape.document import ParsedPage
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "pages")
+
+def load_pages(pages_dir: str) -> dict:
+    with open(os.path.join(pages_dir, "index.json")) as f:
+        index = json.load(f)
+    pages = {}
+    for url, filename in index.items():
+        with open(os.path.join(pages_dir, filename)) as f:
+            pages[url] = f.read()
+    return pages
+
+def two_parses(url: str, page_source: str):
+    """The pre-ParsedPage path: extract_headers and extract_body each parsed the page."""
+    soup = BeautifulSoup(page_source, 'html.parser')
+    headers = [h.text for h in soup.find_all(['h1', 'h2', 'h3'])]
+    soup = BeautifulSoup(page_source, 'html.parser')
+    title = soup.find(id="firstHeading").text if soup.find(id="firstHeading") else ""
+    content_div = soup.find(id="mw-content-text")
+    paragraphs = []
+    if content_div:
+        for p in content_div.find_all('p', recursive=True):
+            if p.text.strip() and not p.find_parent(class_='infobox'):
+                paragraphs.append(p.text.strip())
+            if len(paragraphs) >= 3:
+                break
+    return headers, title, paragraphs
+
+def single_parse(parser: str):
+    def run(url: str, page_source: str):
+        page = ParsedPage(url, page_source, parser=parser)
+        return page.headers(), page.title(), page.paragraphs("mw-content-text", limit=3)
+    return run
+
+def available_parsers() -> list:
+    parsers = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        parsers.append("lxml")
+    except ImportError:
+        pass
+    return parsers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=PAGES_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    strategies = {"two parses (html.parser)": two_parses}
+    for name in available_parsers():
+        strategies[f"ParsedPage ({name})"] = single_parse(name)
+
+    print(f"{'page':<48} {'strategy':<28} {'ms/page':>8}")
+    for url, page_source in pages.items():
+        for name, run in strategies.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                run(url, page_source)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{url:<48} {name:<28} {elapsed * 1000:>8.2f}")
+
+if __name__ == "__main__":
+    main()
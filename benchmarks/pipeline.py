@@ -0,0 +1,196 @@
+"""End-to-end pipeline benchmark over recorded fixtures, fully offline.
+
+Every external service is replayed locally (see benchmarks/replay.py), then
+three stages are run at each concurrency level:
+
+    scrape     `Scraper.scrape_content` for Wikipedia and GitHub tasks
+    generate   `JsonLGenerator.generate_from_text` on what was scraped
+    api        POST /request_model/, poll /request_stage/ until deployed,
+               then POST /completions/ against the fine-tuned model
+
+and for each stage the latency percentiles of one operation, the throughput
+and the peak memory traced while it ran are reported, along with how the
+fine-tuning monitor polled. Jobs that train at the same time must be polled
+through the list endpoint, so the run fails if some did and only single-job
+retrieves were made. Pipeline logs are silenced unless --verbose is given.
+
+    python -m benchmarks.pipeline --concurrency 1 4 --jobs 8
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List
+
+from benchmarks.replay import Replay
+
+import httpx
+from blacksmith.metrics import Metrics, metrics
+from blacksmith.parse import Prompt, MlModel
+from blacksmith.scrape import Scraper, cache
+from blacksmith.train.finetune import JsonLGenerator
+from blacksmith.backend.server import app
+
+TASKS = [
+    "Collect the Wikipedia article on Sherlock Holmes, focusing on his methods and character.",
+    "Collect the source code and documentation of the Zig programming language from GitHub.",
+]
+REQUESTS = [
+    "Create a character model that talks like Sherlock Holmes",
+    "Create a coding assistant that knows the Zig standard library",
+]
+
+@dataclass
+class StageResult:
+    name: str
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    wall: float = 0.0
+    peak_bytes: int = 0
+    llm_calls: int = 0
+    failures: int = 0
+
+    def row(self) -> str:
+        if not self.latencies:
+            return f"{self.name:<14} {self.concurrency:>5} {0:>5} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {self.peak_bytes / 2 ** 20:>8.1f} {self.llm_calls:>6} {self.failures:>5}"
+        ms = [latency * 1000 for latency in self.latencies]
+        p50, p95, p99 = (Metrics.percentile(ms, q) for q in (0.5, 0.95, 0.99))
+        throughput = len(ms) / self.wall if self.wall > 0 else 0.0
+        return (f"{self.name:<14} {self.concurrency:>5} {len(ms):>5} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {max(ms):>8.0f} "
+                f"{throughput:>8.2f} {self.peak_bytes / 2 ** 20:>8.1f} {self.llm_calls:>6} {self.failures:>5}")
+
+HEADER = (f"{'stage':<14} {'conc':>5} {'ops':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'ops/s':>8} {'peak MB':>8} {'llm':>6} {'fail':>5}")
+
+async def run_stage(result: StageResult, replay: Replay, operations: List[Callable[[], Awaitable]]) -> list:
+    """Run operations at most result.concurrency at a time, timing each one."""
+    slots = asyncio.Semaphore(result.concurrency)
+
+    async def timed(operation):
+        async with slots:
+            start = time.perf_counter()
+            try:
+                value = await operation()
+            except Exception as e:
+                print(f"{result.name} operation failed: {e}", file=sys.stderr)
+                result.failures += 1
+                return None
+            result.latencies.append(time.perf_counter() - start)
+            return value
+
+    calls = replay.llm.calls
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    values = await asyncio.gather(*(timed(operation) for operation in operations))
+    result.wall = time.perf_counter() - start
+    if tracemalloc.is_tracing():
+        result.peak_bytes = tracemalloc.get_traced_memory()[1]
+    result.llm_calls = replay.llm.calls - calls
+    return values
+
+def scrape(prompt: Prompt):
+    async def operation():
+        scraper = Scraper(max_attempts=5)
+        await scraper.scrape_content(prompt)
+        text = scraper.corpus_text()
+        scraper.corpus.close()
+        return prompt.webscraping_prompt, text
+    return operation
+
+def generate(task: str, text: str, chunk_tokens: int):
+    async def operation():
+        generator = JsonLGenerator(chunk_tokens=chunk_tokens)
+        await generator.generate_from_text(REQUESTS[0], task, text)
+        pairs = len(generator.data)
+        generator.data.close()
+        return pairs
+    return operation
+
+def request_model(client: httpx.AsyncClient, request: str, poll_interval: float, timeout: float):
+    async def operation():
+        response = await client.post("/request_model/", params={"request": request})
+        response.raise_for_status()
+        job_id = json.loads(response.json())["job_id"]
+        deadline = time.monotonic() + timeout
+        while True:
+            stage = (await client.get(f"/request_stage/{job_id}")).json()["stage"]
+            if stage == "deployed":
+                break
+            if stage == "failed" or time.monotonic() > deadline:
+                raise RuntimeError(f"Job {job_id} ended in stage {stage}")
+            await asyncio.sleep(poll_interval)
+        response = await client.post("/completions/", params={"request": "Where have you been today?", "job_id": job_id})
+        response.raise_for_status()
+        return job_id
+    return operation
+
+async def run(args, replay: Replay) -> List[StageResult]:
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for concurrency in args.concurrency:
+            # Start every level with a cold page cache so levels are comparable
+            cache._default_cache = cache.PageCache(tempfile.mkdtemp(prefix="blacksmith-bench-pages-"))
+            # Tasks and requests are numbered so that no two operations share cached work
+            prompts = [Prompt(model_type=MlModel.Gpt, data_type="text", webscraping_prompt=f"{TASKS[i % len(TASKS)]} (run {concurrency}.{i})")
+                       for i in range(args.jobs)]
+
+            result = StageResult("scrape", concurrency)
+            scraped = await run_stage(result, replay, [scrape(prompt) for prompt in prompts])
+            results.append(result)
+
+            result = StageResult("generate", concurrency)
+            await run_stage(result, replay, [generate(task, text, args.chunk_tokens) for task, text in filter(None, scraped)])
+            results.append(result)
+
+            result = StageResult("api", concurrency)
+            requests = [f"{REQUESTS[i % len(REQUESTS)]} (run {concurrency}.{i})" for i in range(args.jobs)]
+            await run_stage(result, replay, [request_model(client, request, args.poll_interval, args.timeout) for request in requests])
+            results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--jobs", type=int, default=8, help="operations per stage and concurrency level")
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-rpm", type=float, default=500)
+    parser.add_argument("--http-latency", type=float, default=0.01)
+    parser.add_argument("--finetune-seconds", type=float, default=1.0)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="give up on a job after this many seconds")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc, which slows Python code down")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own logs")
+    args = parser.parse_args()
+
+    replay = Replay(llm_latency=args.llm_latency, llm_rpm=args.llm_rpm, http_latency=args.http_latency,
+                    finetune_seconds=args.finetune_seconds, poll_interval=args.poll_interval, browsers=max(args.concurrency))
+    replay.install()
+    if not args.no_memory:
+        tracemalloc.start()
+    try:
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+            results = asyncio.run(run(args, replay))
+    finally:
+        replay.close()
+
+    print(HEADER)
+    for result in results:
+        print(result.row())
+    lists, retrieves = (int(metrics.counters[f"finetune.monitor.{kind}_requests"]) for kind in ("list", "retrieve"))
+    print(f"fine-tuning polls: {lists} list, {retrieves} retrieve")
+    if replay.openai.overlapping_jobs() and lists == 0:
+        sys.exit("Concurrent fine-tuning jobs were never polled through the list endpoint")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare wall-clock time per scrape between the two-call and fused planners.
+
+Runs the same scrapes (a GitHub repository, then a Wikipedia article) over the
+replayed fixtures with each planner mode:
+
+    two-call         Thinker.think, then Worker.get_action
+    fused            one Thinker.plan call, made while the body is extracted
+    fused+prefetch   fused, also fetching the next page as soon as it's planned
+
+The LLM and HTTP latencies are simulated, so the differences come from how
+many round-trips a step makes and how much of them overlap.
+
+    python -m benchmarks.planner --scrapes 8 --concurrency 4 --llm-latency 0.4
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+
+from benchmarks.pipeline import HEADER, StageResult, run_stage
+from benchmarks.replay import Replay, load_fixture
+
+from blacksmith.parse import Prompt, MlModel
+from blacksmith.scrape import Scraper, cache
+
+MODES = [("two-call", "two_call", False), ("fused", "fused", False), ("fused+prefetch", "fused", True)]
+TASK = "Collect the source code of the Zig programming language and background on Sherlock Holmes."
+
+def scrape(prompt: Prompt, planner: str, prefetch: bool):
+    async def operation():
+        scraper = Scraper(max_attempts=5, planner=planner, prefetch=prefetch)
+        await scraper.scrape_content(prompt)
+        scraper.corpus.close()
+    return operation
+
+async def run(args, replay: Replay) -> list:
+    results = []
+    for name, planner, prefetch in MODES:
+        # A cold page cache for every mode, so prefetching has something to save
+        cache._default_cache = cache.PageCache(tempfile.mkdtemp(prefix="blacksmith-bench-pages-"))
+        prompts = [Prompt(model_type=MlModel.Gpt, data_type="text", webscraping_prompt=f"{TASK} ({name} {i})") for i in range(args.scrapes)]
+        result = StageResult(name, args.concurrency)
+        await run_stage(result, replay, [scrape(prompt, planner, prefetch) for prompt in prompts])
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scrapes", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--http-latency", type=float, default=0.1)
+    parser.add_argument("--verbose", action="store_true", help="show the scrapers' own logs")
+    args = parser.parse_args()
+
+    responses = load_fixture("llm", "responses.json")
+    responses["paths"] = {}
+    responses["default_path"] = ["https://github.com/ziglang/zig", "https://en.wikipedia.org/wiki/Sherlock_Holmes"]
+    # No pacing, so only latency and overlap differ between modes
+    replay = Replay(llm_latency=args.llm_latency, llm_rpm=1_000_000, http_latency=args.http_latency,
+                    browsers=args.concurrency, responses=responses)
+    replay.install()
+    try:
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+            results = asyncio.run(run(args, replay))
+    finally:
+        replay.close()
+
+    print(HEADER)
+    for result in results:
+        print(result.row())
+    baseline = sum(results[0].latencies) / max(len(results[0].latencies), 1)
+    for result in results[1:]:
+        mean = sum(result.latencies) / max(len(result.latencies), 1)
+        print(f"{result.name}: {baseline / mean if mean else 0:.2f}x faster per scrape than {results[0].name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Replays recorded fixtures through local stand-ins for every external service.
+
+Pages, GitHub tree listings and raw files are served by `offline_http`, LLM
+calls by a `FakeBackend` whose answers come from `fixtures/llm/responses.json`,
+and the OpenAI files, fine-tuning and chat endpoints by an httpx MockTransport
+that returns the objects recorded in `fixtures/openai/`. `Replay.install()`
+puts all of them behind the process-wide defaults, so the pipeline itself runs
+unchanged.
+"""
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeBrowserPool, FakeDriver, offline_http
+from benchmarks.parse_pages import load_pages
+
+os.environ.setdefault("BLACKSMITH_STATE_DIR", tempfile.mkdtemp(prefix="blacksmith-bench-state-"))
+os.environ.setdefault("BLACKSMITH_CORPUS_DIR", tempfile.mkdtemp(prefix="blacksmith-bench-corpora-"))
+
+import httpx
+from openai import AsyncOpenAI
+from blacksmith.llm import FakeBackend, LLMGateway, fake_completion, set_default_llm_gateway
+from blacksmith.scrape import browser_pool, http_pool
+from blacksmith.scrape.github import GITHUB_API_URL, GITHUB_RAW_BASE_URL
+from blacksmith.train import finetune, monitor
+from blacksmith.deploy import router
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def load_fixture(*path: str):
+    with open(os.path.join(FIXTURES_DIR, *path)) as f:
+        return json.load(f)
+
+def github_pages() -> Dict[str, str]:
+    """Trees API listings and raw file URLs of every recorded repository (fixtures/github/<owner>_<repo>.json)."""
+    pages = {}
+    for filename in sorted(os.listdir(os.path.join(FIXTURES_DIR, "github"))):
+        if not filename.endswith(".json"):
+            continue
+        owner, repo = filename[:-len(".json")].split("_", 1)
+        recorded = load_fixture("github", filename)
+        pages[f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/HEAD?recursive=1"] = json.dumps(recorded["tree"])
+        for path, text in recorded["raw"].items():
+            pages[f"{GITHUB_RAW_BASE_URL}/{owner}/{repo}/HEAD/{path}"] = text
+    return pages
+
+def tool_call(name: str, arguments: dict):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+class ReplayResponder:
+    """Answers each of the pipeline's LLM prompts the way the recorded runs did.
+
+    Prompts are recognized by their fixed instructions. Answers that depend on
+    the input (where to go next, the Q/A pairs for a chunk) are derived from
+    it, so concurrent jobs get distinct results. A scrape visits the pages of
+    the path for its task in order and is done on the last one.
+    """
+
+    def __init__(self, recorded: dict):
+        self.recorded = recorded
+
+    def next_page(self, prompt: str):
+        """The page to go to after the current one, or None if the task is done."""
+        task = re.search(r"TASK: (.*)", prompt).group(1).lower()
+        path = next((path for keyword, path in self.recorded["paths"].items() if keyword in task), self.recorded["default_path"])
+        current_url = re.search(r"CURRENT URL: (\S*)", prompt).group(1).rstrip("/")
+        if current_url not in path:
+            return path[0]
+        index = path.index(current_url)
+        return path[index + 1] if index + 1 < len(path) else None
+
+    def __call__(self, kwargs: dict):
+        prompt = "\n".join(str(message.get("content") or "") for message in kwargs["messages"])
+        tools = {tool["function"]["name"] for tool in kwargs.get("tools", [])}
+        if "model selection assistant" in prompt:
+            arguments = dict(self.recorded["parse_ml_request"])
+            arguments["webscraping_prompt"] += " Request: " + prompt.rsplit("User Request:", 1)[-1].strip()
+            return fake_completion(tool_calls=[tool_call("parse_ml_request", arguments)])
+        if "plan_step" in tools:
+            url = self.next_page(prompt)
+            if url is None:
+                return fake_completion(tool_calls=[tool_call("plan_step", {"status": "DONE", "reason": self.recorded["think"]["done"]})])
+            return fake_completion(tool_calls=[tool_call("plan_step", {
+                "status": "NOT_DONE", "reason": self.recorded["think"]["not_done"].format(url=url), "action": "navigate", "url": url})])
+        if "web automation strategist" in prompt:
+            url = self.next_page(prompt)
+            if url is None:
+                return "DONE: " + self.recorded["think"]["done"]
+            return "NOT_DONE: " + self.recorded["think"]["not_done"].format(url=url)
+        if "Choose the next browser action" in prompt:
+            url = re.search(r"https?://[^\s\"']+", prompt.split("Context:", 1)[1]).group(0)
+            return fake_completion(tool_calls=[tool_call("browser_action", {"action": "navigate", "url": url})])
+        if "relevant when scraping all of the files" in prompt:
+            return self.recorded["file_extensions"]
+        if "generate_question_answer" in prompt:
+            return fake_completion(tool_calls=self.qa_pairs(prompt.rsplit("Data: ", 1)[-1]))
+        return self.recorded["summary"]
+
+    def qa_pairs(self, data: str) -> List:
+        """One Q/A pair per sentence of data, up to qa_pairs_per_chunk."""
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", data) if len(s.split()) >= 6]
+        return [tool_call("generate_question_answer", {
+            "system_prompt": self.recorded["system_prompt"],
+            "user_prompt": "What can you tell me about \"" + " ".join(sentence.split()[:6]) + "\"?",
+            "assistant_prompt": sentence,
+        }) for sentence in sentences[:self.recorded["qa_pairs_per_chunk"]]]
+
+class OpenAIReplay:
+    """Serves the OpenAI files, fine-tuning and chat endpoints from recorded objects.
+
+    A fine-tuning job validates for the first fifth of `finetune_seconds`,
+    then runs and succeeds once `finetune_seconds` have passed since it was
+    created.
+    """
+
+    def __init__(self, finetune_seconds: float = 1.0, latency: float = 0.02):
+        self.finetune_seconds = finetune_seconds
+        self.latency = latency
+        self.file = load_fixture("openai", "file.json")
+        self.job = load_fixture("openai", "fine_tuning_job.json")
+        self.completion = load_fixture("openai", "chat_completion.json")
+        # job id -> (monotonic start, training file id)
+        self.jobs: Dict[str, tuple] = {}
+        self.transport = httpx.MockTransport(self.handle)
+
+    def client(self, **kwargs) -> AsyncOpenAI:
+        return AsyncOpenAI(api_key="benchmark", http_client=httpx.AsyncClient(transport=self.transport))
+
+    def overlapping_jobs(self) -> bool:
+        """Whether any two fine-tuning jobs were running at the same time."""
+        starts = sorted(start for start, _ in self.jobs.values())
+        return any(later - earlier < self.finetune_seconds for earlier, later in zip(starts, starts[1:]))
+
+    def job_state(self, ft_id: str) -> dict:
+        start, training_file = self.jobs[ft_id]
+        elapsed = time.monotonic() - start
+        job = dict(self.job, id=ft_id, training_file=training_file)
+        if elapsed >= self.finetune_seconds:
+            job.update(status="succeeded", fine_tuned_model=f"ft:{job['model']}:blacksmith::{ft_id[-8:]}", finished_at=int(time.time()))
+        elif elapsed >= self.finetune_seconds / 5:
+            job["status"] = "running"
+        return job
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        path = request.url.path.removeprefix("/v1")
+        if request.method == "POST" and path == "/files":
+            body = await request.aread()
+            return httpx.Response(200, json=dict(self.file, id=f"file-{uuid.uuid4().hex[:24]}", bytes=len(body)))
+        if request.method == "POST" and path == "/fine_tuning/jobs":
+            ft_id = f"ftjob-{uuid.uuid4().hex[:24]}"
+            self.jobs[ft_id] = (time.monotonic(), json.loads(request.content)["training_file"])
+            return httpx.Response(200, json=self.job_state(ft_id))
+        if request.method == "GET" and path == "/fine_tuning/jobs":
+            jobs = [self.job_state(ft_id) for ft_id in reversed(self.jobs)]
+            return httpx.Response(200, json={"object": "list", "data": jobs, "has_more": False})
+        if request.method == "GET" and path.startswith("/fine_tuning/jobs/"):
+            ft_id = path.rsplit("/", 1)[-1]
+            if ft_id not in self.jobs:
+                return httpx.Response(404, json={"error": {"message": f"No such job: {ft_id}"}})
+            return httpx.Response(200, json=self.job_state(ft_id))
+        if request.method == "POST" and path == "/chat/completions":
+            return self.chat(json.loads(request.content))
+        return httpx.Response(404, json={"error": {"message": f"Not recorded: {request.method} {path}"}})
+
+    def chat(self, body: dict) -> httpx.Response:
+        completion = dict(self.completion, model=body["model"])
+        if not body.get("stream"):
+            return httpx.Response(200, json=completion)
+        events = []
+        for word in completion["choices"][0]["message"]["content"].split(" "):
+            chunk = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"], "model": body["model"],
+                     "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            events.append(f"data: {json.dumps(chunk)}\n\n")
+        events.append("data: [DONE]\n\n")
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content="".join(events).encode())
+
+class Replay:
+    """Everything the pipeline talks to, served locally from the fixtures."""
+
+    def __init__(self, llm_latency: float = 0.05, llm_rpm: float = 500, http_latency: float = 0.01,
+                 finetune_seconds: float = 1.0, poll_interval: float = 0.1, browsers: int = 4, responses: Optional[dict] = None):
+        self.pages = load_pages(os.path.join(FIXTURES_DIR, "pages"))
+        self.responses = responses or load_fixture("llm", "responses.json")
+        self.llm = FakeBackend(ReplayResponder(self.responses), latency=llm_latency)
+        self.llm_rpm = llm_rpm
+        self.http = offline_http({**self.pages, **github_pages()}, latency=http_latency)
+        self.openai = OpenAIReplay(finetune_seconds)
+        self.poll_interval = poll_interval
+        self.browsers = browsers
+
+    def install(self):
+        """Make the process-wide defaults (and the clients the pipeline creates) use the replay."""
+        set_default_llm_gateway(LLMGateway(backend=self.llm, default_limits=(self.llm_rpm, 200_000)))
+        http_pool._default_client = self.http
+        browser_pool._default_pool = FakeBrowserPool(size=self.browsers, driver_factory=lambda: FakeDriver(self.pages))
+        monitor._default_monitor = monitor.FinetuneMonitor(min_interval=self.poll_interval, max_interval=self.poll_interval * 10)
+        finetune._default_openai_client = self.openai.client()
+        router._default_router = router.InferenceRouter(backends={"gpt": router.OpenAIInference(self.openai.client())})
+
+    def close(self):
+        browser_pool._default_pool.close()
@@ -0,0 +1,89 @@
+"""Upload a generated dataset through each provider's SDK, fully offline.
+
+Builds a JsonLData of --examples records, then runs `GptModel.create_file` and
+`MistralModel.create_file` against httpx MockTransports that count the bytes
+received. Fails if either SDK rejects the upload or the server doesn't get
+the whole dataset; otherwise reports time and peak memory per upload.
+
+    python -m benchmarks.uploads --examples 20000
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+from benchmarks.replay import load_fixture
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+import httpx
+from mistralai import Mistral
+from openai import AsyncOpenAI
+from blacksmith.train.finetune import GptModel, MistralModel
+from blacksmith.train.jsonl import JsonLData
+
+MISTRAL_FILE = {
+    "id": "497f6eca-6276-4993-bfeb-53cbbbba6f09",
+    "object": "file",
+    "size_bytes": 0,
+    "created_at": 1739998352,
+    "filename": "data.jsonl",
+    "purpose": "fine-tune",
+    "sample_type": "instruct",
+    "source": "upload",
+}
+
+class UploadServer:
+    """Accepts file uploads on both providers' endpoints and remembers their size."""
+
+    def __init__(self):
+        self.received = []
+        self.transport = httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        self.received.append(len(body))
+        if request.url.host == "api.mistral.ai":
+            return httpx.Response(200, json=dict(MISTRAL_FILE, size_bytes=len(body)))
+        return httpx.Response(200, json=dict(load_fixture("openai", "file.json"), bytes=len(body)))
+
+def dataset(examples: int) -> JsonLData:
+    data = JsonLData()
+    for i in range(examples):
+        data.add_prompt("You are Sherlock Holmes.", f"What do you make of clue number {i}?",
+                        "It is a capital mistake to theorize before one has data. " * 4)
+    return data
+
+async def upload(name: str, model, data: JsonLData, server: UploadServer):
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    file = await model.create_file(data)
+    elapsed = time.perf_counter() - start
+    received = server.received[-1]
+    # The multipart body wraps the file, so it's a little bigger than the dataset
+    if received < data.size:
+        raise SystemExit(f"{name}: the server got {received} bytes of a {data.size} byte dataset")
+    print(f"{name:<8} {file.id:<40} {received / 2 ** 20:>8.1f} {elapsed * 1000:>8.0f} {tracemalloc.get_traced_memory()[1] / 2 ** 20:>8.1f}")
+
+async def run(args):
+    server = UploadServer()
+    data = dataset(args.examples)
+    gpt = GptModel(AsyncOpenAI(api_key="benchmark", http_client=httpx.AsyncClient(transport=server.transport)))
+    mistral = MistralModel(Mistral(api_key="benchmark", async_client=httpx.AsyncClient(transport=server.transport)))
+
+    print(f"{data.count} examples, {data.size / 2 ** 20:.1f} MB")
+    print(f"{'provider':<8} {'file id':<40} {'sent MB':>8} {'ms':>8} {'peak MB':>8}")
+    tracemalloc.start()
+    await upload("gpt", gpt, data, server)
+    await upload("mistral", mistral, data, server)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+from ..parse import Prompt
+from ..parse.parsing import normalize_request
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, asdict, field
+from typing import List, Literal, Optional
+
+# Pipeline stages in the order they complete; a checkpoint records the last one reached
+CheckpointStage = Literal["created", "scraped", "generated", "training", "deployed"]
+STAGE_ORDER: List[str] = ["created", "scraped", "generated", "training", "deployed"]
+
+def request_hash(request: str, prompt: Prompt, scrape_mode: str, model_type: str) -> str:
+    """Identify everything that determines a pipeline's output, so identical requests can share work."""
+    key = json.dumps({
+        "request": normalize_request(request),
+        "prompt": prompt.to_dict(),
+        "scrape_mode": scrape_mode,
+        "model_type": model_type,
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+@dataclass
+class Checkpoint:
+    job_id: str
+    request_hash: str
+    request: str
+    prompt: dict
+    scrape_mode: str
+    model_type: str = "gpt"
+    stage: CheckpointStage = "created"
+    corpus_path: Optional[str] = None
+    dataset_path: Optional[str] = None
+    ft_id: Optional[str] = None
+    ft_name: Optional[str] = None
+    system_prompt: Optional[str] = None
+    error: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def reached(self, stage: CheckpointStage) -> bool:
+        return STAGE_ORDER.index(self.stage) >= STAGE_ORDER.index(stage)
+
+    def reuse(self, donor: "Checkpoint"):
+        """Take over the stages donor (an identical request) has already completed."""
+        self.stage = donor.stage
+        self.corpus_path = donor.corpus_path
+        self.dataset_path = donor.dataset_path
+        self.ft_id = donor.ft_id
+        self.ft_name = donor.ft_name
+        self.system_prompt = donor.system_prompt
+
+class CheckpointStore:
+    """Durable record of how far each job has got, so a restarted server can pick it back up.
+
+    One SQLite row per job holds its checkpoint as JSON; stage outputs that are
+    too big for a row (the corpus, the generated dataset) are files whose paths
+    the checkpoint keeps.
+    """
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(state_dir, "jobs.sqlite"), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_id TEXT PRIMARY KEY,
+                request_hash TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                error TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS checkpoints_request_hash ON checkpoints (request_hash);
+        """)
+        self.db.commit()
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, job_id)
+
+    def save(self, checkpoint: Checkpoint):
+        checkpoint.updated_at = time.time()
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, request_hash, stage, error, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (checkpoint.job_id, checkpoint.request_hash, checkpoint.stage, checkpoint.error,
+                 json.dumps(asdict(checkpoint)), checkpoint.updated_at))
+
+    def get(self, job_id: str) -> Optional[Checkpoint]:
+        row = self.db.execute("SELECT data FROM checkpoints WHERE job_id = ?", (job_id,)).fetchone()
+        return Checkpoint(**json.loads(row[0])) if row else None
+
+    def best_for(self, request_hash: str) -> Optional[Checkpoint]:
+        """The checkpoint of an identical request that got furthest, if any got past creation."""
+        rows = self.db.execute(
+            "SELECT data FROM checkpoints WHERE request_hash = ? AND stage != 'created' ORDER BY updated_at DESC",
+            (request_hash,)).fetchall()
+        checkpoints = [Checkpoint(**json.loads(row[0])) for row in rows]
+        if not checkpoints:
+            return None
+        return max(checkpoints, key=lambda checkpoint: STAGE_ORDER.index(checkpoint.stage))
+
+    def unfinished(self) -> List[Checkpoint]:
+        """Jobs that neither deployed nor failed, e.g. because the server stopped under them."""
+        rows = self.db.execute(
+            "SELECT data FROM checkpoints WHERE stage != 'deployed' AND error IS NULL ORDER BY updated_at").fetchall()
+        return [Checkpoint(**json.loads(row[0])) for row in rows]
+
+    def close(self):
+        self.db.close()
+
+_default_store: Optional[CheckpointStore] = None
+
+def default_checkpoint_store() -> CheckpointStore:
+    """The process-wide checkpoint store under BLACKSMITH_STATE_DIR."""
+    global _default_store
+    if _default_store is None:
+        _default_store = CheckpointStore(
+            os.getenv("BLACKSMITH_STATE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "blacksmith", "state")))
+    return _default_store
@@ -0,0 +1,227 @@
+from ..parse import Prompt
+from ..progress import ProgressChannel, ProgressEvent
+from ..scrape import Scraper
+from ..scrape.corpus import CorpusStore, corpus_path
+from ..train import SmithModel
+from ..train.finetune import Status
+from ..train.jsonl import JsonLData
+from .checkpoints import Checkpoint, CheckpointStage, CheckpointStore, default_checkpoint_store, request_hash
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Literal, Optional, Dict
+
+Stage = Literal["queued", "parsing", "scraping", "finetuning", "deploying", "not_ready", "deployed", "failed"]
+ScrapeMode = Literal["trajectory", "frontier"]
+
+class Job:
+    def __init__(self, checkpoint: Checkpoint, store: CheckpointStore):
+        self.checkpoint = checkpoint
+        self.store = store
+        self.id = checkpoint.job_id
+        self.request = checkpoint.request
+        self.prompt = Prompt.from_dict(checkpoint.prompt)
+        self.scrape_mode = checkpoint.scrape_mode
+        self.progress = ProgressChannel(summarizer=self.summarize)
+        self.scraper = Scraper(corpus=CorpusStore(checkpoint.corpus_path))
+        self.scraper.progress = self.progress
+        self.model = SmithModel(checkpoint.model_type)
+        self.model.progress = self.progress
+        self.model.system_prompt = checkpoint.system_prompt
+        self.model.model.ft_id = checkpoint.ft_id
+        self.model.model.ft_name = checkpoint.ft_name
+        self.model.complete = checkpoint.reached("deployed")
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        if self.model.complete:
+            self.set_stage("deployed", "Deployed with name: " + self.ft_name)
+        elif checkpoint.error is not None:
+            self.error = checkpoint.error
+            self.set_stage("failed", "Failed: " + checkpoint.error)
+        else:
+            self.set_stage("queued", "Waiting for a free pipeline slot...")
+
+    @classmethod
+    def create(cls, request: str, prompt: Prompt, scrape_mode: ScrapeMode, store: CheckpointStore) -> "Job":
+        """Start a new job, reusing whatever an identical earlier request already completed."""
+        job_id = uuid.uuid4().hex
+        checkpoint = Checkpoint(
+            job_id=job_id,
+            request_hash=request_hash(request, prompt, scrape_mode, "gpt"),
+            request=request,
+            prompt=prompt.to_dict(),
+            scrape_mode=scrape_mode,
+            corpus_path=corpus_path(job_id),
+        )
+        donor = store.best_for(checkpoint.request_hash)
+        if donor is not None:
+            print(f"Reusing stages up to '{donor.stage}' from job {donor.job_id}")
+            checkpoint.reuse(donor)
+        store.save(checkpoint)
+        return cls(checkpoint, store)
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("deployed", "failed")
+
+    @property
+    def ft_name(self) -> Optional[str]:
+        return self.model.model.ft_name
+
+    def set_stage(self, stage: Stage, summary: Optional[str] = None):
+        self.stage = stage
+        self.progress.emit(stage, summary=summary)
+
+    def advance(self, stage: CheckpointStage):
+        """Record that a pipeline stage finished, so it isn't redone after a restart."""
+        self.checkpoint.stage = stage
+        self.store.save(self.checkpoint)
+
+    async def summarize(self, event: ProgressEvent) -> str:
+        """Summarize a progress event of this job; called once per event by the progress channel."""
+        if event.stage == "scraping":
+            return await self.scraper.state.summarize()
+        elif event.stage == "finetuning":
+            status = event.detail.get("status")
+            return await self.model.summarize(Status(status) if status else None)
+        return "Preparing..."
+
+    async def run(self):
+        """Run the scrape -> finetune pipeline for this job, skipping stages already checkpointed."""
+        checkpoint = self.checkpoint
+        if not checkpoint.reached("scraped"):
+            # A scrape interrupted by a restart continues into the same corpus, skipping pages it already has
+            self.set_stage("scraping", "Starting to scrape data for your model...")
+            if self.scrape_mode == "frontier":
+                await self.scraper.scrape_frontier(self.prompt)
+            else:
+                await self.scraper.scrape_content(self.prompt)
+            self.advance("scraped")
+
+        self.set_stage("finetuning", "Preparing to finetune model...")
+        dataset: Optional[JsonLData] = None
+        if not checkpoint.reached("generated"):
+            chunks = self.scraper.corpus.chunks(self.model.jsonl_generator.chunk_tokens)
+            dataset = await self.model.generate_dataset(self.request, self.prompt.webscraping_prompt, chunks)
+            if len(dataset) == 0:
+                self.fail("No training examples could be generated from the scraped data.")
+                return
+            checkpoint.dataset_path = os.path.join(self.store.job_dir(self.id), "dataset.jsonl")
+            await asyncio.to_thread(dataset.save, checkpoint.dataset_path)
+            self.advance("generated")
+
+        if not checkpoint.reached("training"):
+            dataset = dataset or await asyncio.to_thread(JsonLData.load, checkpoint.dataset_path)
+            checkpoint.ft_id = await self.model.start_finetune(dataset)
+            checkpoint.system_prompt = self.model.system_prompt
+            self.advance("training")
+
+        if not checkpoint.reached("deployed"):
+            await self.model.wait_for_finetune()
+            if not self.model.complete:
+                # Let a retry of this request start a new fine-tune from the same dataset
+                checkpoint.stage, checkpoint.ft_id = "generated", None
+                self.fail("Fine-tuning did not complete.")
+                return
+            checkpoint.ft_name = self.ft_name
+            self.advance("deployed")
+
+        self.set_stage("deployed", "Deployed with name: " + self.ft_name)
+
+    def fail(self, error: str):
+        self.error = error
+        self.checkpoint.error = error
+        self.store.save(self.checkpoint)
+        self.set_stage("failed", "Failed: " + error)
+
+class JobManager:
+    """Registry of pipeline jobs keyed by job id, with bounded concurrency.
+
+    Jobs are checkpointed after every stage; `resume` restarts the ones a
+    previous process left unfinished. Finished (deployed or failed) jobs are
+    dropped from memory `finished_ttl` seconds after they finish, or sooner
+    once there are more than `max_finished` of them, and are reloaded from
+    their checkpoint if someone asks for them again.
+    """
+
+    def __init__(self, max_concurrent_jobs: int = 16, scrape_mode: Optional[ScrapeMode] = None, checkpoints: Optional[CheckpointStore] = None,
+                 finished_ttl: float = 3600, max_finished: int = 1000):
+        self.jobs: Dict[str, Job] = {}
+        # job id -> when it finished, oldest first
+        self._finished_at: OrderedDict[str, float] = OrderedDict()
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.scrape_mode = scrape_mode or os.getenv("BLACKSMITH_SCRAPE_MODE", "trajectory")
+        self._checkpoints = checkpoints
+        self._slots = asyncio.Semaphore(max_concurrent_jobs)
+
+    @property
+    def checkpoints(self) -> CheckpointStore:
+        # Resolved lazily so that importing the server doesn't touch the state directory
+        if self._checkpoints is None:
+            self._checkpoints = default_checkpoint_store()
+        return self._checkpoints
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        # Only finished jobs are evicted; an unfinished checkpoint that isn't registered belongs to no running pipeline
+        checkpoint = self.checkpoints.get(job_id)
+        if checkpoint is None or not (checkpoint.reached("deployed") or checkpoint.error is not None):
+            return None
+        job = self.jobs[job_id] = Job(checkpoint, self.checkpoints)
+        self._retire(job)
+        return job
+
+    def submit(self, request: str, prompt: Prompt) -> Job:
+        """Register a new job and schedule it to run once a slot is free."""
+        return self._schedule(Job.create(request, prompt, self.scrape_mode, self.checkpoints))
+
+    def resume(self) -> int:
+        """Reschedule every checkpointed job that hasn't finished; returns how many."""
+        resumed = 0
+        for checkpoint in self.checkpoints.unfinished():
+            if checkpoint.job_id in self.jobs:
+                continue
+            print(f"Resuming job {checkpoint.job_id} after stage '{checkpoint.stage}'")
+            self._schedule(Job(checkpoint, self.checkpoints))
+            resumed += 1
+        return resumed
+
+    def _schedule(self, job: Job) -> Job:
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def _run(self, job: Job):
+        async with self._slots:
+            print(f"Running job {job.id}")
+            try:
+                await job.run()
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.fail(str(e))
+            finally:
+                await job.scraper.close()
+                job.scraper.corpus.close()
+                if job.finished:
+                    self._retire(job)
+
+    def _retire(self, job: Job):
+        """Note that job is done, and drop finished jobs that are past their TTL or over the cap."""
+        self._finished_at[job.id] = time.time()
+        self._finished_at.move_to_end(job.id)
+        expired = time.time() - self.finished_ttl
+        while self._finished_at:
+            job_id, finished_at = next(iter(self._finished_at.items()))
+            if finished_at > expired and len(self._finished_at) <= self.max_finished:
+                break
+            del self._finished_at[job_id]
+            evicted = self.jobs.pop(job_id, None)
+            if evicted is not None:
+                evicted.scraper.corpus.close()
@@ -1,15 +1,20 @@
-from ..parse import PromptParser, Prompt, MlModel
-from ..scrape import Scraper, AutomationState
-from ..train import SmithModel
+from ..deploy import Deployment, default_inference_router
+from ..llm import default_llm_gateway
+from ..metrics import metrics
+from ..parse import Prompt, MlModel, default_prompt_parser
+from ..scrape.browser_pool import default_browser_pool
+from .jobs import Job, JobManager
 
 import asyncio
-from typing import Literal
-from fastapi import FastAPI
+import json
+import os
+import time
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from openai import AsyncOpenAI
-
 app = FastAPI()
 
 origins = ["*"]
@@ -22,63 +27,137 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-stage: Literal["parsing", "scraping", "finetuning", "deploying", "not_ready", "deployed"] = "not_ready"
-scraper = Scraper()
-model = SmithModel("gpt")
+jobs = JobManager(max_concurrent_jobs=16)
 ft_model = "ft:gpt-4o-mini-2024-07-18:monet::B1IBTo3q"
+default_system_prompt = "You are Sherlock Holmes."
+max_batch_size = 64
+
+class BatchCompletionRequest(BaseModel):
+    requests: List[str]
+    job_id: Optional[str] = None
+    cache: bool = False
+
+@app.on_event("startup")
+async def warm_browsers():
+    warm = int(os.getenv("BLACKSMITH_BROWSER_WARM", "0"))
+    if warm > 0:
+        await default_browser_pool().warm(warm)
+
+@app.on_event("startup")
+async def resume_jobs():
+    if os.getenv("BLACKSMITH_RESUME_JOBS", "1") == "1":
+        resumed = jobs.resume()
+        if resumed:
+            print(f"Resumed {resumed} unfinished jobs")
+
+@app.on_event("shutdown")
+def close_browsers():
+    default_browser_pool().close()
+
+def get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return job
+
+def get_deployment(job_id: Optional[str]) -> Deployment:
+    """The model to answer with: a job's fine-tuned model, or the default one without a job id."""
+    if job_id is None:
+        return Deployment("gpt", ft_model, default_system_prompt)
+    # Jobs deployed by an earlier process are no longer registered, but their checkpoints are kept
+    job = jobs.get(job_id)
+    checkpoint = job.checkpoint if job is not None else jobs.checkpoints.get(job_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    if not checkpoint.reached("deployed") or checkpoint.ft_name is None:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not deployed yet")
+    return Deployment(checkpoint.model_type, checkpoint.ft_name, checkpoint.system_prompt or default_system_prompt)
 
 @app.post("/request_model/")
 async def request_model(request: str):
     print(request)
-    prompt_parser = PromptParser()
-    prompt = prompt_parser.analyze_request(request)
+    try:
+        prompt = await default_prompt_parser().analyze_request_async(request)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to analyze request: {e}")
 
-    asyncio.create_task(handle_model_request(request, prompt))
+    job = jobs.submit(request, prompt)
 
-    return prompt.to_json()
+    return json.dumps({"job_id": job.id, **prompt.to_dict()})
 
 @app.post("/completions/")
-async def completions(request: str):
+async def completions(request: str, job_id: Optional[str] = None, stream: bool = False, cache: bool = False):
+    """Answer request with the job's model; with cache, a remembered answer to the same question may be reused."""
     print(request)
-    print(model.system_prompt)
-    client = AsyncOpenAI()
-    if model.system_prompt is None:
-        model.system_prompt = "You are Sherlock Holmes."
-    response = await client.chat.completions.create(
-            model=ft_model,
-            messages=[
-                {"role": "system", "content": model.system_prompt},
-                {"role": "user", "content": request},
-            ])
-    return response.choices[0].message.content
-
-
-@app.get("/request_stage/")
-async def request_stage():
-    global ft_model
-    if not scraper.complete: 
-        stage = "scraping"
-        summary = await scraper.state.summarize()
-    elif not model.complete:
-        stage = "finetuning"
-        summary = await model.summarize()
-    else:
-        stage = "deployed"
-        summary = "Deployed with name: " + model.model.ft_name
-        ft_model = model.model.ft_name
-    return {"stage": stage, "summary": summary}
-
-async def handle_model_request(request: str, prompt: Prompt):
-    print("Handling model request")
-    data = await scrape_data(prompt)
-    model = await finetune_model(request, prompt.webscraping_prompt, data)
-    return model
-
-async def scrape_data(prompt: Prompt) -> AutomationState:
-    print("Scraping data")
-    await scraper.scrape_content(prompt)
-    print("Scraping complete")
-    return scraper.state
-
-async def finetune_model(model_query: str, data_query: str, data: str):
-    await model.finetune_text_model(model_query, data_query, data)
+    deployment = get_deployment(job_id)
+    print(deployment.system_prompt)
+
+    start = time.perf_counter()
+    if stream:
+        return StreamingResponse(stream_completion(deployment, request, start, cache), media_type="text/event-stream")
+
+    try:
+        content = await default_inference_router().complete(deployment, request, cache=cache)
+    except asyncio.TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Completion failed: {e}")
+    metrics.observe("completions.latency", time.perf_counter() - start)
+    return content
+
+@app.post("/completions/batch/")
+async def batch_completions(batch: BatchCompletionRequest):
+    """Answer many requests to one model at once; each result has either a completion or an error."""
+    if len(batch.requests) > max_batch_size:
+        raise HTTPException(status_code=413, detail=f"At most {max_batch_size} requests per batch")
+    deployment = get_deployment(batch.job_id)
+    start = time.perf_counter()
+    results = await default_inference_router().complete_many(deployment, batch.requests, cache=batch.cache)
+    metrics.observe("completions.batch_latency", time.perf_counter() - start)
+    return [{"completion": result} if isinstance(result, str) else {"error": str(result) or type(result).__name__}
+            for result in results]
+
+async def stream_completion(deployment: Deployment, request: str, start: float, cache: bool = False):
+    """Forward completion tokens as server-sent events as soon as they arrive."""
+    first_token = True
+    try:
+        async for token in default_inference_router().stream(deployment, request, cache=cache):
+            if first_token:
+                metrics.observe("completions.time_to_first_token", time.perf_counter() - start)
+                first_token = False
+            yield f"data: {json.dumps({'token': token})}\n\n"
+    except Exception as e:
+        print(f"Streaming completion failed: {e}")
+        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    metrics.observe("completions.latency", time.perf_counter() - start)
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/request_stage/{job_id}")
+async def request_stage(job_id: str):
+    job = get_job(job_id)
+    return {"job_id": job.id, **job.progress.snapshot()}
+
+@app.get("/request_stage/{job_id}/events")
+async def request_stage_events(job_id: str):
+    """Push this job's progress events as server-sent events until it finishes."""
+    job = get_job(job_id)
+
+    async def events():
+        async for event in job.progress.subscribe():
+            yield f"data: {json.dumps({'job_id': job.id, **event.to_dict()})}\n\n"
+            if event.stage in ("deployed", "failed"):
+                break
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/metrics/")
+async def get_metrics():
+    snapshot = metrics.snapshot()
+    llm_cache = default_llm_gateway().cache
+    if llm_cache is not None:
+        snapshot["llm_cache"] = llm_cache.stats()
+    completion_cache = default_inference_router().cache
+    if completion_cache is not None:
+        snapshot["completion_cache"] = completion_cache.stats()
+    return snapshot
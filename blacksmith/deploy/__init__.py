@@ -0,0 +1,2 @@
+from .cache import CompletionCache
+from .router import Deployment, InferenceRouter, default_inference_router
@@ -0,0 +1,210 @@
+from ..metrics import metrics
+
+import hashlib
+import json
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+if TYPE_CHECKING:
+    from .router import Deployment
+
+class HashingEmbedder:
+    """Embeds text locally as hashed character trigrams; catches rewordings and typos, not paraphrases."""
+
+    def __init__(self, dims: int = 512):
+        self.dims = dims
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        text = f" {text} "
+        for i in range(len(text) - 2):
+            vector[zlib.crc32(text[i:i + 3].encode()) % self.dims] += 1
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class OpenAIEmbedder:
+    """Embeds text with an OpenAI embedding model over one pooled client."""
+
+    def __init__(self, model: str = "text-embedding-3-small", client: Optional[AsyncOpenAI] = None):
+        self.model = model
+        self.client = client or AsyncOpenAI(max_retries=1, http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)))
+
+    async def embed(self, text: str) -> np.ndarray:
+        response = await self.client.embeddings.create(model=self.model, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "openai": OpenAIEmbedder,
+}
+
+class VectorIndex:
+    """Unit vectors by key in one growing matrix, searched by cosine similarity."""
+
+    def __init__(self, dims: int, capacity: int = 64):
+        self.vectors = np.zeros((capacity, dims), dtype=np.float32)
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key: str, vector: np.ndarray):
+        if key in self.rows:
+            self.vectors[self.rows[key]] = vector
+            return
+        if len(self.keys) == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+        self.rows[key] = len(self.keys)
+        self.vectors[len(self.keys)] = vector
+        self.keys.append(key)
+
+    def remove(self, key: str):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # Move the last row into the gap so the live rows stay contiguous
+        last = self.keys.pop()
+        if last != key:
+            self.vectors[row] = self.vectors[len(self.keys)]
+            self.keys[row] = last
+            self.rows[last] = row
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        if not self.keys:
+            return None, 0.0
+        scores = self.vectors[:len(self.keys)] @ vector
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+@dataclass
+class CachedCompletion:
+    content: str
+    # How long the model took to answer, i.e. what a hit saves
+    latency: float
+    created_at: float
+    partition: str
+
+class CompletionCache:
+    """Answers from deployed models, reused for repeated questions.
+
+    Entries are keyed by the model, its system prompt, the request parameters
+    and the user text with case and whitespace folded, so "Who are you?" and
+    "who are  you?" share one. With an embedder, a question with no exact
+    match can also be served the answer to the most similar cached question
+    of the same deployment, if their cosine similarity is at least
+    `threshold`. The least recently used entries are evicted past
+    `max_entries`, and entries expire after `ttl` seconds. Hits, misses and
+    the model time they saved are recorded under `completion_cache.*` in the
+    metrics registry.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 3600, embedder=None, threshold: float = 0.92):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.threshold = threshold
+        self.entries: OrderedDict[str, CachedCompletion] = OrderedDict()
+        # partition -> index of the entries' question embeddings
+        self.indexes: Dict[str, VectorIndex] = {}
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def partition(deployment: "Deployment", params: dict) -> str:
+        """Which entries can answer for deployment: same model, system prompt and parameters."""
+        key = json.dumps([deployment.provider, deployment.model, deployment.system_prompt, params], sort_keys=True, default=str)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        # Only case and spacing; punctuation and non-latin text can change the question ("2+2" vs "2-2")
+        return " ".join(prompt.casefold().split())
+
+    async def get(self, deployment: "Deployment", prompt: str, params: dict) -> Tuple[Optional[CachedCompletion], Optional[np.ndarray]]:
+        """The cached answer to prompt, if any, and the prompt's embedding for `put` on a miss."""
+        partition = self.partition(deployment, params)
+        text = self.normalize(prompt)
+        entry = self._live(f"{partition}:{text}")
+        if entry is not None:
+            self.exact_hits += 1
+            return self._hit("exact", entry), None
+
+        vector = None
+        if self.embedder is not None:
+            try:
+                vector = await self.embedder.embed(text)
+            except Exception as e:
+                print(f"Embedding for the completion cache failed: {e}")
+        index = self.indexes.get(partition)
+        if vector is not None and index is not None:
+            key, score = index.nearest(vector)
+            entry = self._live(key) if key is not None and score >= self.threshold else None
+            if entry is not None:
+                self.similar_hits += 1
+                metrics.observe("completion_cache.similarity", score)
+                return self._hit("similar", entry), vector
+
+        self.misses += 1
+        metrics.incr("completion_cache.misses")
+        return None, vector
+
+    def put(self, deployment: "Deployment", prompt: str, params: dict, content: str, latency: float, vector: Optional[np.ndarray] = None):
+        partition = self.partition(deployment, params)
+        key = f"{partition}:{self.normalize(prompt)}"
+        self.entries[key] = CachedCompletion(content, latency, time.time(), partition)
+        self.entries.move_to_end(key)
+        if vector is not None:
+            index = self.indexes.get(partition)
+            if index is None:
+                index = self.indexes[partition] = VectorIndex(len(vector))
+            index.add(key, vector)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def _live(self, key: str) -> Optional[CachedCompletion]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl:
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _hit(self, kind: str, entry: CachedCompletion) -> CachedCompletion:
+        self.seconds_saved += entry.latency
+        metrics.incr(f"completion_cache.{kind}_hits")
+        metrics.observe("completion_cache.latency_saved", entry.latency)
+        return entry
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        index = self.indexes.get(entry.partition)
+        if index is not None:
+            index.remove(key)
+            if not index:
+                del self.indexes[entry.partition]
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+        }
@@ -0,0 +1,297 @@
+from ..metrics import metrics
+from .cache import EMBEDDERS, CompletionCache
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Literal, Optional, Union
+
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI, DefaultAsyncHttpxClient
+
+Provider = Literal["gpt", "mistral"]
+
+@dataclass
+class Deployment:
+    """A fine-tuned model that can be served: which provider hosts it, its name there and its system prompt."""
+    provider: Provider
+    model: str
+    system_prompt: str
+
+    def messages(self, prompt: str) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed completion is worth trying again: timeouts, dropped connections, 429s and 5xxs."""
+    if isinstance(error, (APIConnectionError, APITimeoutError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    # Mistral's SDK errors carry the HTTP status as status_code
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+def _pooled_http_client(max_connections: int) -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                             timeout=httpx.Timeout(120, connect=10))
+
+class OpenAIInference:
+    """Chat completions against OpenAI fine-tuned models over one pooled client."""
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None, max_connections: int = 100):
+        # Retries and timeouts are the router's job, so the SDK shouldn't retry on its own as well
+        self.client = client or AsyncOpenAI(max_retries=0, http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)))
+
+    async def complete(self, model: str, messages: List[dict], **params) -> str:
+        response = await self.client.chat.completions.create(model=model, messages=messages, **params)
+        return response.choices[0].message.content
+
+    async def stream(self, model: str, messages: List[dict], **params) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+class MistralInference:
+    """Chat completions against Mistral fine-tuned models over one pooled client."""
+
+    def __init__(self, client=None, max_connections: int = 100):
+        if client is None:
+            from mistralai import Mistral
+            client = Mistral(os.getenv("MISTRAL_API_KEY"), async_client=_pooled_http_client(max_connections))
+        self.client = client
+
+    async def complete(self, model: str, messages: List[dict], **params) -> str:
+        response = await self.client.chat.complete_async(model=model, messages=messages, **params)
+        return response.choices[0].message.content
+
+    async def stream(self, model: str, messages: List[dict], **params) -> AsyncIterator[str]:
+        response = await self.client.chat.stream_async(model=model, messages=messages, **params)
+        async for event in response:
+            if event.data.choices and event.data.choices[0].delta.content:
+                yield event.data.choices[0].delta.content
+
+BACKENDS = {
+    "gpt": OpenAIInference,
+    "mistral": MistralInference,
+}
+
+class InferenceRouter:
+    """Serves completions from deployed models on whichever provider hosts them.
+
+    Each provider has one pooled client, created on first use. Each model gets
+    at most `max_concurrency` requests in flight (or its entry in `limits`);
+    the rest queue for a slot. Hedging is off by default; with `hedge_after`,
+    a completion that takes longer than that many seconds gets a second,
+    identical request if the model has a free slot for it, and whichever
+    answers first wins. Set it above the model's usual latency (e.g. its p95
+    `inference.<provider>.latency`), or most long completions are paid for
+    twice. Requests are cut off after `timeout` seconds, and
+    timeouts, 429s, 5xxs and connection errors are retried with jittered
+    exponential backoff. Metrics are recorded under `inference.<provider>.*`.
+    Callers that are happy with a remembered answer to the same (or, with an
+    embedder, a similar) question can pass `cache=True` to be served from the
+    completion cache, if the router has one.
+    """
+
+    def __init__(self, backends: Optional[Dict[str, object]] = None,
+                 max_concurrency: int = 16,
+                 limits: Optional[Dict[str, int]] = None,
+                 timeout: float = 60,
+                 hedge_after: Optional[float] = None,
+                 retries: int = 2,
+                 backoff: float = 0.5,
+                 cache: Optional[CompletionCache] = None):
+        self.backends = backends or {}
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        # model -> requests in flight
+        self.limits = limits or {}
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.retries = retries
+        self.backoff = backoff
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    def backend(self, provider: Provider):
+        backend = self.backends.get(provider)
+        if backend is None:
+            if provider not in BACKENDS:
+                raise ValueError(f"Unknown provider {provider!r}, expected one of {', '.join(BACKENDS)}")
+            backend = self.backends[provider] = BACKENDS[provider]()
+        return backend
+
+    def slots(self, model: str) -> asyncio.Semaphore:
+        slots = self._slots.get(model)
+        if slots is None:
+            slots = self._slots[model] = asyncio.Semaphore(self.limits.get(model, self.max_concurrency))
+        return slots
+
+    async def complete(self, deployment: Deployment, prompt: str, cache: bool = False, **params) -> str:
+        """The model's answer to prompt; params (e.g. temperature) are passed to the provider."""
+        if cache and self.cache is not None:
+            cached, vector = await self.cache.get(deployment, prompt, params)
+            if cached is not None:
+                return cached.content
+            start = time.perf_counter()
+            content = await self.complete(deployment, prompt, **params)
+            self.cache.put(deployment, prompt, params, content, time.perf_counter() - start, vector)
+            return content
+
+        prefix = f"inference.{deployment.provider}"
+        backend = self.backend(deployment.provider)
+        messages = deployment.messages(prompt)
+        start = time.perf_counter()
+        slots = self.slots(deployment.model)
+        async with slots:
+            metrics.observe(f"{prefix}.queue_time", time.perf_counter() - start)
+            for attempt in range(self.retries + 1):
+                try:
+                    content = await self._hedged(prefix, backend, deployment.model, messages, params, slots)
+                    break
+                except Exception as e:
+                    metrics.incr(f"{prefix}.errors")
+                    if attempt == self.retries or not is_retryable(e):
+                        raise
+                    delay = random.uniform(0, self.backoff * 2 ** attempt)
+                    print(f"Completion from {deployment.model} failed ({e!r}), retrying in {delay:.1f}s")
+                    metrics.incr(f"{prefix}.retries")
+                    await asyncio.sleep(delay)
+        metrics.observe(f"{prefix}.latency", time.perf_counter() - start)
+        metrics.incr(f"{prefix}.requests")
+        return content
+
+    async def _hedged(self, prefix: str, backend, model: str, messages: List[dict], params: dict, slots: asyncio.Semaphore) -> str:
+        """One attempt at a completion, hedged with a second request if the first is slow and a slot is free."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        hedge_at = loop.time() + self.hedge_after if self.hedge_after is not None else deadline
+        first = asyncio.ensure_future(backend.complete(model, messages, **params))
+        pending = {first}
+        error: Optional[Exception] = None
+        hedged = False
+        try:
+            while pending:
+                hedging = len(pending) == 1 and error is None and hedge_at < deadline
+                wait = (hedge_at if hedging else deadline) - loop.time()
+                done, pending = await asyncio.wait(pending, timeout=max(wait, 0), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            metrics.incr(f"{prefix}.hedge_wins")
+                        return task.result()
+                    error = task.exception()
+                if done:
+                    continue
+                if not hedging:
+                    metrics.incr(f"{prefix}.timeouts")
+                    raise asyncio.TimeoutError(f"No completion from {model} within {self.timeout:g}s")
+                hedge_at = deadline
+                # The hedge counts against the model's limit like any other request; skip it if there's no room
+                if slots.locked():
+                    metrics.incr(f"{prefix}.hedges_skipped")
+                    continue
+                await slots.acquire()
+                hedged = True
+                metrics.incr(f"{prefix}.hedges")
+                pending.add(asyncio.ensure_future(backend.complete(model, messages, **params)))
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if hedged:
+                slots.release()
+
+    async def stream(self, deployment: Deployment, prompt: str, cache: bool = False, **params) -> AsyncIterator[str]:
+        """The model's answer to prompt, token by token.
+
+        Streams aren't hedged, and are only retried if they fail before the
+        first token; `timeout` bounds the wait for the first token. A cached
+        answer comes as a single token.
+        """
+        if cache and self.cache is not None:
+            cached, vector = await self.cache.get(deployment, prompt, params)
+            if cached is not None:
+                yield cached.content
+                return
+            start, tokens = time.perf_counter(), []
+            async for token in self.stream(deployment, prompt, **params):
+                tokens.append(token)
+                yield token
+            self.cache.put(deployment, prompt, params, "".join(tokens), time.perf_counter() - start, vector)
+            return
+
+        prefix = f"inference.{deployment.provider}"
+        backend = self.backend(deployment.provider)
+        messages = deployment.messages(prompt)
+        start = time.perf_counter()
+        async with self.slots(deployment.model):
+            metrics.observe(f"{prefix}.queue_time", time.perf_counter() - start)
+            for attempt in range(self.retries + 1):
+                tokens = backend.stream(deployment.model, messages, **params).__aiter__()
+                try:
+                    token = await asyncio.wait_for(tokens.__anext__(), timeout=self.timeout)
+                    break
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    metrics.incr(f"{prefix}.errors")
+                    await tokens.aclose()
+                    if attempt == self.retries or not is_retryable(e):
+                        raise
+                    metrics.incr(f"{prefix}.retries")
+                    await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            metrics.observe(f"{prefix}.time_to_first_token", time.perf_counter() - start)
+            try:
+                yield token
+                async for token in tokens:
+                    yield token
+            finally:
+                await tokens.aclose()
+        metrics.observe(f"{prefix}.latency", time.perf_counter() - start)
+        metrics.incr(f"{prefix}.requests")
+
+    async def complete_many(self, deployment: Deployment, prompts: List[str], cache: bool = False, **params) -> List[Union[str, Exception]]:
+        """Answers to many prompts at once, in order; a prompt that failed gets its exception instead.
+
+        Chat endpoints take one conversation per request, so a batch is sent
+        as concurrent requests within the model's limit, with repeated
+        prompts asked only once.
+        """
+        unique = list(dict.fromkeys(prompts))
+        metrics.incr(f"inference.{deployment.provider}.batched", len(prompts))
+        metrics.incr(f"inference.{deployment.provider}.batch_duplicates", len(prompts) - len(unique))
+        results = await asyncio.gather(*(self.complete(deployment, prompt, cache=cache, **params) for prompt in unique), return_exceptions=True)
+        answers = dict(zip(unique, results))
+        return [answers[prompt] for prompt in prompts]
+
+_default_router: Optional[InferenceRouter] = None
+
+def default_inference_router() -> InferenceRouter:
+    """The process-wide router that serves every deployed model."""
+    global _default_router
+    if _default_router is None:
+        # Hedging is opt-in, as it can double the cost of slow completions
+        hedge_after = os.getenv("BLACKSMITH_INFERENCE_HEDGE_AFTER", "")
+        # The exact tier is always there for callers that ask for it; the similarity tier needs an embedder
+        embedder = os.getenv("BLACKSMITH_COMPLETION_CACHE_EMBEDDER", "")
+        cache = CompletionCache(
+            max_entries=int(os.getenv("BLACKSMITH_COMPLETION_CACHE_SIZE", "4096")),
+            ttl=float(os.getenv("BLACKSMITH_COMPLETION_CACHE_TTL", "3600")),
+            embedder=EMBEDDERS[embedder]() if embedder else None,
+            threshold=float(os.getenv("BLACKSMITH_COMPLETION_CACHE_SIMILARITY", "0.92")),
+        )
+        _default_router = InferenceRouter(
+            max_concurrency=int(os.getenv("BLACKSMITH_INFERENCE_CONCURRENCY", "16")),
+            timeout=float(os.getenv("BLACKSMITH_INFERENCE_TIMEOUT", "60")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            retries=int(os.getenv("BLACKSMITH_INFERENCE_RETRIES", "2")),
+            cache=cache,
+        )
+    return _default_router
@@ -0,0 +1,323 @@
+from .metrics import metrics
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI, DefaultAsyncHttpxClient
+
+# Rough size of a token, for pacing requests before we know their real usage
+CHARS_PER_TOKEN = 4
+
+class TokenBucket:
+    """Allows `rate` units per second on average, with bursts of up to `capacity`.
+
+    Callers reserve their units up front and sleep off any deficit, so waiters
+    are served in arrival order without holding a lock.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount: float = 1):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request bigger than the bucket would never fit; charge it a full bucket instead
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+class OpenAIBackend:
+    """Sends chat completions to the OpenAI API over one pooled connection."""
+
+    def __init__(self, max_connections: int = 64):
+        # Retries are the gateway's job, so the SDK shouldn't retry on its own as well
+        self.client = AsyncOpenAI(
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)),
+        )
+
+    async def complete(self, **kwargs):
+        return await self.client.chat.completions.create(**kwargs)
+
+def fake_completion(content: Optional[str] = None, tool_calls: Optional[List] = None, prompt_tokens: int = 0, completion_tokens: int = 0):
+    """Build an object shaped like an OpenAI chat completion."""
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+class FakeBackend:
+    """A local backend whose completions come from `responder`, for offline runs and load tests.
+
+    The responder gets the request's keyword arguments and returns either a
+    string (the message content) or a full completion object.
+    """
+
+    def __init__(self, responder: Optional[Callable[[dict], Any]] = None, latency: float = 0.05):
+        self.responder = responder or (lambda kwargs: "")
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        response = self.responder(kwargs)
+        if isinstance(response, str):
+            prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+            return fake_completion(response, prompt_tokens=prompt_chars // CHARS_PER_TOKEN, completion_tokens=len(response) // CHARS_PER_TOKEN)
+        return response
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", "")) if response is not None else None
+    except ValueError:
+        return None
+
+def _to_record(response) -> dict:
+    message = response.choices[0].message
+    return {
+        "content": message.content,
+        "tool_calls": [{"name": call.function.name, "arguments": call.function.arguments} for call in message.tool_calls or []],
+    }
+
+def _from_record(record: dict):
+    tool_calls = [SimpleNamespace(function=SimpleNamespace(name=call["name"], arguments=call["arguments"])) for call in record["tool_calls"]]
+    return fake_completion(record["content"], tool_calls or None)
+
+class ResponseCache:
+    """Persistent cache of LLM responses for calls whose answer only depends on their input.
+
+    Entries are keyed by a hash of the model, messages, tool schemas and other
+    request parameters, and hold just the message content and tool calls.
+    They expire after `ttl` seconds, and the least recently used ones are
+    evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+        """)
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        row = self.db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return _from_record(json.loads(row[0]))
+
+    def put(self, key: str, response):
+        value = json.dumps(_to_record(response))
+        now = time.time()
+        self.db.execute("INSERT OR REPLACE INTO responses (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                        (key, value, len(value), now, now))
+        self.db.commit()
+        self.evict()
+
+    def evict(self):
+        self.db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+        self.db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        self.db.close()
+
+class Coalescer:
+    """Runs one call per key at a time; callers that arrive while it is in flight share its result.
+
+    The call runs as its own task, so a cancelled caller (even the one that
+    started it) doesn't cancel it for the others; it is only cancelled once
+    every caller waiting on it has gone.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._in_flight
+
+    async def run(self, key: str, call: Callable[[], Awaitable]):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _finished(self, key: str, task: asyncio.Task):
+        self._forget(key, task)
+        # Mark the exception retrieved in case every caller had gone
+        if not task.cancelled():
+            task.exception()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+class LLMGateway:
+    """The single way components talk to the LLM.
+
+    Every call goes through one backend (a pooled OpenAI client by default) and
+    is paced by per-model token buckets for requests and tokens per minute.
+    Calls that fail with a 429, a 5xx, a timeout or a connection error are
+    retried with exponential backoff and full jitter, honouring Retry-After.
+    Identical requests that are in flight at the same time share one call.
+    Latency, requests, errors and token usage are recorded per caller under
+    `llm.<caller>.*` in the metrics registry. Callers whose answers only
+    depend on their input can pass `cache=True` to be served from the
+    response cache, if the gateway has one.
+    """
+
+    def __init__(self, backend=None,
+                 limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default_limits: Tuple[float, float] = (500, 200_000),
+                 max_retries: int = 4,
+                 backoff: float = 0.5,
+                 timeout: float = 60,
+                 cache: Optional[ResponseCache] = None):
+        self.backend = backend or OpenAIBackend()
+        self.cache = cache
+        # model -> (requests per minute, tokens per minute)
+        self.limits = limits or {}
+        self.default_limits = default_limits
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._in_flight = Coalescer()
+
+    def _buckets_for(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._buckets.get(model)
+        if buckets is None:
+            rpm, tpm = self.limits.get(model, self.default_limits)
+            buckets = self._buckets[model] = (TokenBucket(rpm / 60, max(rpm / 60, 1)), TokenBucket(tpm / 60, tpm / 60))
+        return buckets
+
+    @staticmethod
+    def request_key(kwargs: dict) -> str:
+        return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def chat(self, caller: str, coalesce: bool = True, cache: bool = False, **kwargs):
+        """Make a chat completion call on behalf of caller; kwargs are passed to the backend."""
+        key = self.request_key(kwargs)
+        if cache and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.incr(f"llm.{caller}.cache_hits")
+                return cached
+            metrics.incr(f"llm.{caller}.cache_misses")
+            response = await self.chat(caller, coalesce=coalesce, **kwargs)
+            self.cache.put(key, response)
+            return response
+
+        if not coalesce:
+            return await self._call(caller, kwargs)
+
+        if key in self._in_flight:
+            metrics.incr(f"llm.{caller}.coalesced")
+        return await self._in_flight.run(key, lambda: self._call(caller, kwargs))
+
+    async def _call(self, caller: str, kwargs: dict):
+        requests, tokens = self._buckets_for(kwargs.get("model", ""))
+        prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+        for attempt in range(self.max_retries + 1):
+            await requests.acquire()
+            await tokens.acquire(prompt_chars / CHARS_PER_TOKEN)
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(self.backend.complete(**kwargs), timeout=self.timeout)
+            except Exception as e:
+                metrics.incr(f"llm.{caller}.errors")
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, self.backoff * 2 ** attempt)
+                print(f"LLM call for {caller} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            metrics.observe(f"llm.{caller}.latency", time.perf_counter() - start)
+            metrics.incr(f"llm.{caller}.requests")
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                metrics.incr(f"llm.{caller}.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+                metrics.incr(f"llm.{caller}.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+            return response
+
+_default_gateway: Optional[LLMGateway] = None
+
+def default_llm_gateway() -> LLMGateway:
+    """The process-wide gateway every component uses unless given its own."""
+    global _default_gateway
+    if _default_gateway is None:
+        cache = None
+        if os.getenv("BLACKSMITH_LLM_CACHE", "1") == "1":
+            cache = ResponseCache(
+                os.getenv("BLACKSMITH_LLM_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "blacksmith", "llm.sqlite")),
+                ttl=float(os.getenv("BLACKSMITH_LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                max_bytes=int(os.getenv("BLACKSMITH_LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            )
+        _default_gateway = LLMGateway(
+            default_limits=(float(os.getenv("BLACKSMITH_LLM_RPM", "500")), float(os.getenv("BLACKSMITH_LLM_TPM", "200000"))),
+            max_retries=int(os.getenv("BLACKSMITH_LLM_RETRIES", "4")),
+            timeout=float(os.getenv("BLACKSMITH_LLM_TIMEOUT", "60")),
+            cache=cache,
+        )
+    return _default_gateway
+
+def set_default_llm_gateway(gateway: Optional[LLMGateway]):
+    """Swap the process-wide gateway, e.g. for one with a FakeBackend in load tests."""
+    global _default_gateway
+    _default_gateway = gateway
@@ -0,0 +1,40 @@
+from collections import defaultdict, deque
+from typing import Deque, Dict
+
+class Metrics:
+    """In-process counters and latency samples, exposed by the backend at /metrics/."""
+
+    def __init__(self, max_samples: int = 2048):
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def incr(self, name: str, value: float = 1):
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        self.samples[name].append(value)
+
+    @staticmethod
+    def percentile(values, q: float) -> float:
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def summary(self, name: str) -> dict:
+        values = self.samples[name]
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": self.percentile(values, 0.5),
+            "p95": self.percentile(values, 0.95),
+            "max": max(values),
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "samples": {name: self.summary(name) for name in self.samples},
+        }
+
+metrics = Metrics()
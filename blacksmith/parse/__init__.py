@@ -1 +1 @@
-from .parsing import PromptParser, Prompt, MlModel
+from .parsing import PromptParser, Prompt, MlModel, RequestCache, default_prompt_parser
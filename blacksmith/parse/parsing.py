@@ -1,7 +1,14 @@
 from dataclasses import dataclass
 from enum import Enum
+from collections import OrderedDict
+import asyncio
 import json
-from openai import OpenAI
+import os
+import re
+import time
+from typing import FrozenSet, Optional, Tuple
+
+from ..llm import Coalescer, LLMGateway, default_llm_gateway
 
 class MlModel(Enum):
     Gpt = "gpt4o-mini"
@@ -13,16 +20,94 @@ class Prompt:
     data_type: str
     webscraping_prompt: str
 
-    def to_json(self):
-        return json.dumps({
+    def to_dict(self):
+        return {
             "model_type": self.model_type.value,
             "data_type": self.data_type,
             "webscraping_prompt": self.webscraping_prompt
-        })
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Prompt":
+        return cls(
+            model_type=MlModel(data["model_type"]),
+            data_type=data["data_type"],
+            webscraping_prompt=data["webscraping_prompt"]
+        )
+
+def normalize_request(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+# Words a request can gain or lose without asking for something else
+FILLER_WORDS = frozenset("""
+    a an the please pls i i'd i'm me my we want would like to can could you your just
+    make create build train get give some that which will is be of for with using
+    model llm chatbot bot ai assistant
+""".split())
+
+class RequestCache:
+    """Remembers analyzed requests by their normalized wording.
+
+    By default only requests that normalize to the same text share an entry.
+    With a `threshold`, a request with no exact match can also reuse the most
+    similar cached request, if the Jaccard similarity of the two word sets is
+    at least `threshold` and every word in one but not the other is filler
+    ("please", "a", "model", ...), so "Speak like Sherlock Holmes!" and
+    "please speak like sherlock holmes" share an entry, but a different name
+    or an added "not" never does.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 24 * 3600, threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries: OrderedDict[str, Tuple[FrozenSet[str], "Prompt", float]] = OrderedDict()
+
+    def get(self, text: str) -> Optional["Prompt"]:
+        key = normalize_request(text)
+        entry = self.entries.get(key)
+        if entry is None and self.threshold is not None:
+            key, entry = self._nearest(frozenset(key.split()))
+        if entry is None:
+            return None
+        if time.time() - entry[2] > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def _nearest(self, words: FrozenSet[str]):
+        best_key, best_entry, best_score = None, None, self.threshold
+        if not words:
+            return best_key, best_entry
+        for key, entry in self.entries.items():
+            cached = entry[0]
+            # Jaccard can't reach the threshold when the sizes are too far apart
+            if min(len(cached), len(words)) < best_score * max(len(cached), len(words)):
+                continue
+            if not (cached ^ words) <= FILLER_WORDS:
+                continue
+            score = len(cached & words) / len(cached | words)
+            if score >= best_score:
+                best_key, best_entry, best_score = key, entry, score
+        return best_key, best_entry
+
+    def put(self, text: str, prompt: "Prompt"):
+        key = normalize_request(text)
+        self.entries[key] = (frozenset(key.split()), prompt, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
 
 class PromptParser:
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(self, llm: Optional[LLMGateway] = None, cache: Optional[RequestCache] = None):
+        self.llm = llm or default_llm_gateway()
+        self.cache = cache or RequestCache()
+        self._pending = Coalescer()
         self.system_prompt = """You are a model selection assistant. Your ONLY job is to output a JSON object that selects the right model and data collection strategy.
 
 STRICT RULES:
@@ -82,23 +167,59 @@ Input: "I want to build a chatbot that can respond to me about patent law"
             }
         ]
 
-    def analyze_request(self, user_input: str) -> Prompt:
+    async def analyze_request_async(self, user_input: str) -> Prompt:
+        """Pick a model and scraping prompt for user_input, reusing cached analyses."""
+        cached = self.cache.get(user_input)
+        if cached is not None:
+            return cached
+
+        # Concurrent identical requests share one LLM call
+        return await self._pending.run(normalize_request(user_input), lambda: self._analyze_and_cache(user_input))
+
+    async def _analyze_and_cache(self, user_input: str) -> Prompt:
+        prompt = await self._analyze(user_input)
+        self.cache.put(user_input, prompt)
+        return prompt
+
+    async def _analyze(self, user_input: str) -> Prompt:
         prompt = f"{self.system_prompt}\n\nUser Request: {user_input}"
-        response = self.client.chat.completions.create(
+        response = await self.llm.chat(
+            "parser.analyze",
             model="gpt-4o-mini",
             messages=[
                 {"role": "user", "content": prompt},
             ],
             tools=self.tools,
         )
-        for tool_call in response.choices[0].message.tool_calls:
-            kwargs = eval(tool_call.function.arguments)
+        for tool_call in response.choices[0].message.tool_calls or []:
+            if tool_call.function.name != "parse_ml_request":
+                continue
+            kwargs = json.loads(tool_call.function.arguments)
 
             return Prompt(
                 model_type=MlModel(kwargs["model_type"]),
                 data_type=kwargs["data_type"],
                 webscraping_prompt=kwargs["webscraping_prompt"]
             )
+        raise ValueError("The model did not return a parse_ml_request call")
+
+    def analyze_request(self, user_input: str) -> Prompt:
+        """Blocking version of analyze_request_async for scripts; don't call it from a running event loop."""
+        return asyncio.run(self.analyze_request_async(user_input))
+
+_default_parser: Optional[PromptParser] = None
+
+def default_prompt_parser() -> PromptParser:
+    """The process-wide parser, sharing one request cache."""
+    global _default_parser
+    if _default_parser is None:
+        # Exact matches only unless near-duplicate reuse is asked for
+        similarity = os.getenv("BLACKSMITH_PROMPT_CACHE_SIMILARITY", "")
+        _default_parser = PromptParser(cache=RequestCache(
+            max_entries=int(os.getenv("BLACKSMITH_PROMPT_CACHE_SIZE", "1024")),
+            threshold=float(similarity) if similarity else None,
+        ))
+    return _default_parser
 
 if __name__ == "__main__":
     analyzer = PromptParser()
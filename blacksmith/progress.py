@@ -0,0 +1,79 @@
+import asyncio
+import time
+from dataclasses import dataclass, field, asdict
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+@dataclass
+class ProgressEvent:
+    stage: str
+    version: int
+    detail: dict = field(default_factory=dict)
+    summary: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+class ProgressChannel:
+    """Structured progress events for one pipeline, pushed to any number of watchers.
+
+    Pipeline stages call `emit` when something changes. If an event has no
+    summary of its own, the summarizer (usually an LLM call) runs once for it in
+    the background; events that are superseded before the summarizer gets to
+    them are skipped. Readers only ever see the cached latest event, so reading
+    progress costs nothing no matter how many clients are watching.
+    """
+
+    def __init__(self, summarizer: Optional[Callable[[ProgressEvent], Awaitable[str]]] = None):
+        self.summarizer = summarizer
+        self.latest: Optional[ProgressEvent] = None
+        self.summary: Optional[str] = None
+        self._version = 0
+        self._subscribers: List[asyncio.Queue] = []
+        self._summarizing: Optional[asyncio.Task] = None
+
+    def emit(self, stage: str, summary: Optional[str] = None, **detail) -> ProgressEvent:
+        self._version += 1
+        event = ProgressEvent(stage=stage, version=self._version, detail=detail, summary=summary)
+        self.latest = event
+        if summary is not None:
+            self.summary = summary
+        elif self.summarizer is not None and (self._summarizing is None or self._summarizing.done()):
+            self._summarizing = asyncio.create_task(self._summarize_latest())
+        self._publish(event)
+        return event
+
+    async def _summarize_latest(self):
+        # Keep going until the summary we produced is for the newest event
+        while self.latest is not None and self.latest.summary is None:
+            event = self.latest
+            try:
+                summary = await self.summarizer(event)
+            except Exception as e:
+                print(f"Failed to summarize progress: {e}")
+                return
+            event.summary = summary
+            self.summary = summary
+            if event is self.latest:
+                self._publish(event)
+
+    def _publish(self, event: ProgressEvent):
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def snapshot(self) -> dict:
+        if self.latest is None:
+            return {"stage": "not_ready", "summary": self.summary, "version": 0}
+        return {"stage": self.latest.stage, "summary": self.summary, "version": self.latest.version, "detail": self.latest.detail}
+
+    async def subscribe(self) -> AsyncIterator[ProgressEvent]:
+        """Yield the latest event and then every event after it."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            if self.latest is not None:
+                yield self.latest
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(queue)
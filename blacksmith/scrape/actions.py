@@ -0,0 +1,178 @@
+from .condense import PageOutline
+from .document import ParsedPage
+
+import json
+import urllib.parse
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Literal, Optional
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+ActionKind = Literal["navigate", "click", "type", "scroll", "extract", "follow_link"]
+ACTION_KINDS = ["navigate", "click", "type", "scroll", "extract", "follow_link"]
+
+class ActionError(ValueError):
+    """An action that is malformed or doesn't apply to the current page, caught before the browser runs it."""
+
+@dataclass
+class Action:
+    kind: ActionKind
+    # Id of the target in the page outline; resolved to url or selector by validate
+    element: Optional[int] = None
+    url: Optional[str] = None
+    selector: Optional[str] = None
+    text: Optional[str] = None
+    submit: bool = False
+    direction: Literal["up", "down"] = "down"
+
+    @classmethod
+    def from_arguments(cls, arguments: dict) -> "Action":
+        kind = arguments.get("action")
+        if kind not in ACTION_KINDS:
+            raise ActionError(f"Unknown action {kind!r}, expected one of {', '.join(ACTION_KINDS)}")
+        element = arguments.get("element")
+        if element is not None:
+            try:
+                element = int(str(element).strip("[] "))
+            except ValueError:
+                raise ActionError(f"Element ids are numbers, not {element!r}")
+        return cls(
+            kind=kind,
+            element=element,
+            url=arguments.get("url") or None,
+            selector=arguments.get("selector") or None,
+            text=arguments.get("text") or None,
+            submit=bool(arguments.get("submit", False)),
+            direction=arguments.get("direction") or "down",
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def __str__(self):
+        args = ", ".join(f"{key}={value!r}" for key, value in self.to_dict().items()
+                         if key != "kind" and value not in (None, False) and not (key == "direction" and self.kind != "scroll"))
+        return f"{self.kind}({args})"
+
+ACTION_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "browser_action",
+            "description": "Perform one browser action for the scraping task",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {
+                        "type": "string",
+                        "enum": ACTION_KINDS,
+                        "description": "navigate: open url; follow_link: open a link on this page by url or text; "
+                                       "click: click the element matching selector; type: type text into the element matching selector; "
+                                       "scroll: scroll one screen in direction; extract: save the current page's content"
+                    },
+                    "element": {"type": "integer", "description": "Id of a link, input or button in the page outline, for follow_link, click and type"},
+                    "url": {"type": "string", "description": "For navigate, or follow_link to a link that isn't in the outline"},
+                    "selector": {"type": "string", "description": "CSS selector, for click and type on an element that isn't in the outline"},
+                    "text": {"type": "string", "description": "Text to type, or the text of the link to follow"},
+                    "submit": {"type": "boolean", "description": "Press Enter after typing"},
+                    "direction": {"type": "string", "enum": ["up", "down"], "description": "For scroll"}
+                },
+                "required": ["action"],
+                "additionalProperties": False
+            }
+        }
+    }
+]
+
+def parse_action(response) -> Action:
+    """The action in a completion made with ACTION_TOOLS."""
+    for tool_call in response.choices[0].message.tool_calls or []:
+        if tool_call.function.name != "browser_action":
+            continue
+        try:
+            return Action.from_arguments(json.loads(tool_call.function.arguments))
+        except json.JSONDecodeError as e:
+            raise ActionError(f"Malformed browser_action arguments: {e}")
+    raise ActionError("The model did not return a browser_action call")
+
+def resolve_element(action: Action, outline: Optional[PageOutline]):
+    """Replace the action's element id with the URL or selector of that element."""
+    element = outline.element(action.element) if outline is not None else None
+    if element is None:
+        raise ActionError(f"There is no element [{action.element}] on this page")
+    if element.kind == "link":
+        if action.kind not in ("click", "follow_link"):
+            raise ActionError(f"[{element.id}] is a link, so it can only be followed")
+        # Following a link over HTTP is cheaper than clicking it in the browser
+        action.kind, action.url = "follow_link", element.url
+    else:
+        if action.kind not in ("click", "type"):
+            raise ActionError(f"[{element.id}] ({element.kind}) can only be clicked or typed into")
+        action.selector = element.selector
+    action.element = None
+
+def validate(action: Action, page: Optional[ParsedPage], outline: Optional[PageOutline] = None) -> Action:
+    """Check that action can run on page, resolving element ids, relative URLs and link text to concrete targets.
+
+    Raises ActionError without touching the browser, so a bad action costs
+    nothing but the attempt.
+    """
+    if action.element is not None:
+        resolve_element(action, outline)
+    if action.kind == "navigate":
+        if not action.url:
+            raise ActionError("navigate needs a url")
+        url = urllib.parse.urljoin(page.url, action.url) if page is not None else action.url
+        if not url.startswith(("http://", "https://")):
+            raise ActionError(f"Can only navigate to http(s) URLs, not {action.url!r}")
+        action.url = url
+    elif action.kind == "follow_link":
+        if page is None:
+            raise ActionError("There is no page to follow a link on")
+        wanted_url = urllib.parse.urljoin(page.url, action.url) if action.url else None
+        wanted_text = " ".join(action.text.split()).lower() if action.text else None
+        for text, url in page.links():
+            if url == wanted_url or (wanted_text and text.lower() == wanted_text):
+                action.url = url
+                break
+        else:
+            raise ActionError(f"No link on {page.url} matches {action.url or action.text!r}")
+    elif action.kind in ("click", "type"):
+        if not action.selector:
+            raise ActionError(f"{action.kind} needs a selector")
+        if action.kind == "type" and action.text is None:
+            raise ActionError("type needs text")
+        if page is not None:
+            try:
+                element = page.soup.select_one(action.selector)
+            except Exception as e:
+                raise ActionError(f"Invalid selector {action.selector!r}: {e}")
+            if element is None:
+                raise ActionError(f"No element on {page.url} matches {action.selector!r}")
+    elif action.kind == "scroll":
+        if action.direction not in ("up", "down"):
+            raise ActionError(f"Can only scroll up or down, not {action.direction!r}")
+    return action
+
+def click(driver, action: Action):
+    driver.find_element(By.CSS_SELECTOR, action.selector).click()
+
+def type_text(driver, action: Action):
+    element = driver.find_element(By.CSS_SELECTOR, action.selector)
+    element.clear()
+    element.send_keys(action.text + (Keys.ENTER if action.submit else ""))
+
+def scroll(driver, action: Action):
+    driver.execute_script("window.scrollBy(0, arguments[0] * window.innerHeight);", 1 if action.direction == "down" else -1)
+
+# Actions that run on the browser itself; navigation and extraction are up to the caller
+BROWSER_ACTIONS: Dict[str, Callable] = {
+    "click": click,
+    "type": type_text,
+    "scroll": scroll,
+}
+
+def perform(driver, action: Action):
+    """Run a browser action on driver; blocking, so async callers run it on the browser's executor."""
+    BROWSER_ACTIONS[action.kind](driver, action)
@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from selenium import webdriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+class PooledBrowser:
+    def __init__(self, driver: webdriver.Chrome, profile_dir: str, executor: ThreadPoolExecutor):
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.executor = executor
+        self.pages = 0
+
+    def record_page(self):
+        self.pages += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking driver call on the pool's executor instead of the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def wait_until_loaded(self, timeout: float = 10):
+        WebDriverWait(self.driver, timeout).until(
+            lambda driver: driver.execute_script("return document.readyState") == "complete")
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Failed to quit browser: {e}")
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+class BrowserPool:
+    """A bounded pool of reusable headless Chrome browsers.
+
+    Each browser gets its own throwaway profile directory and is wiped (cookies,
+    cache, storage, extra tabs) between leases so jobs never see each other's
+    state. Browsers are health-checked before reuse and recycled after
+    `max_pages_per_browser` page views to keep memory in check. All driver
+    calls run on a dedicated thread pool so they never block the event loop.
+    """
+
+    def __init__(self, size: int = 4, headless: bool = True, max_pages_per_browser: int = 50):
+        self.size = size
+        self.headless = headless
+        self.max_pages_per_browser = max_pages_per_browser
+        self._idle: List[PooledBrowser] = []
+        self._slots = asyncio.Semaphore(size)
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="blacksmith-browser")
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def _launch(self) -> PooledBrowser:
+        profile_dir = tempfile.mkdtemp(prefix="blacksmith-chrome-")
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument(f"--user-data-dir={profile_dir}")
+        return PooledBrowser(webdriver.Chrome(options=options), profile_dir, self.executor)
+
+    def _is_healthy(self, browser: PooledBrowser) -> bool:
+        if browser.pages >= self.max_pages_per_browser:
+            return False
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _reset(self, browser: PooledBrowser):
+        """Wipe per-job state so the next lease starts from a clean profile."""
+        driver = browser.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+        driver.delete_all_cookies()
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": "*", "storageTypes": "all"})
+
+    async def acquire(self) -> PooledBrowser:
+        """Lease a clean browser, launching one if none are idle."""
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                browser = self._idle.pop()
+                if await self._run(self._is_healthy, browser):
+                    return browser
+                await self._run(browser.quit)
+            return await self._run(self._launch)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _recycle(self, browser: PooledBrowser) -> bool:
+        if self._is_healthy(browser):
+            try:
+                self._reset(browser)
+                return True
+            except Exception as e:
+                print(f"Failed to reset browser, recycling: {e}")
+        browser.quit()
+        return False
+
+    async def release(self, browser: PooledBrowser):
+        """Return a leased browser to the pool, recycling it if it is worn out or broken."""
+        try:
+            if await self._run(self._recycle, browser):
+                self._idle.append(browser)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def lease(self):
+        browser = await self.acquire()
+        try:
+            yield browser
+        finally:
+            await self.release(browser)
+
+    async def warm(self, count: Optional[int] = None):
+        """Pre-launch browsers so the first jobs don't pay Chrome's cold start."""
+        count = min(count or self.size, self.size)
+        browsers = [await self.acquire() for _ in range(count)]
+        for browser in browsers:
+            await self.release(browser)
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().quit()
+        self.executor.shutdown(wait=False)
+
+_default_pool: Optional[BrowserPool] = None
+
+def default_browser_pool() -> BrowserPool:
+    """The process-wide browser pool shared by every Scraper that doesn't bring its own."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = BrowserPool(
+            size=int(os.getenv("BLACKSMITH_BROWSER_POOL_SIZE", "4")),
+            max_pages_per_browser=int(os.getenv("BLACKSMITH_BROWSER_MAX_PAGES", "50")),
+        )
+    return _default_pool
@@ -0,0 +1,231 @@
+from .http_pool import HttpClient
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+@dataclass
+class CachedPage:
+    url: str
+    content_hash: str
+    html: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+class PageCache:
+    """On-disk, content-addressed cache of fetched pages and what we extracted from them.
+
+    Raw HTML is stored once per content hash under `blobs/`, and a SQLite index
+    maps each URL to its latest content hash plus the validators (ETag,
+    Last-Modified) needed to revalidate it. Extraction results are stored
+    alongside so a cache hit skips parsing as well as the network. Entries
+    older than `ttl` are revalidated before reuse. Once blobs and extractions
+    together exceed `max_bytes`, extractions past their TTL are pruned and
+    then the least recently used pages and extractions are evicted. A blob is
+    deleted as soon as no page points at it any more.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float = 24 * 3600, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                content_hash TEXT,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL DEFAULT 0
+            );
+        """)
+        # Indexes written before extractions were size-accounted lack these columns
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(extractions)")}
+        if "size" not in columns:
+            self.db.execute("ALTER TABLE extractions ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self.db.execute("UPDATE extractions SET size = LENGTH(value)")
+        if "last_used" not in columns:
+            self.db.execute("ALTER TABLE extractions ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self.db.execute("UPDATE extractions SET last_used = created_at")
+        self.db.commit()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", digest[:2], digest)
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return time.time() - page.fetched_at < self.ttl
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        row = self.db.execute(
+            "SELECT content_hash, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._blob_path(row[0])) as f:
+                html = f.read()
+        except FileNotFoundError:
+            self.db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self.db.commit()
+            return None
+        self.db.execute("UPDATE pages SET last_used = ? WHERE url = ?", (time.time(), url))
+        self.db.commit()
+        return CachedPage(url, row[0], html, row[1], row[2], row[3])
+
+    def put(self, url: str, html: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        """Store a page's HTML and return its content hash."""
+        digest = content_hash(html)
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(html)
+            self.db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?)", (digest, os.path.getsize(path)))
+        previous = self.db.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        now = time.time()
+        self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                        (url, digest, etag, last_modified, now, now))
+        # The URL's old content is garbage unless another URL has the same content
+        if previous is not None and previous[0] != digest:
+            self._release_blob(previous[0])
+        self.db.commit()
+        self.evict()
+        return digest
+
+    def touch(self, url: str):
+        """Mark a page as freshly revalidated (e.g. after a 304 Not Modified)."""
+        now = time.time()
+        self.db.execute("UPDATE pages SET fetched_at = ?, last_used = ? WHERE url = ?", (now, now, url))
+        self.db.commit()
+
+    def get_extraction(self, key: str, digest: Optional[str] = None) -> Optional[dict]:
+        """Look up a stored extraction result.
+
+        If digest is given the result is only returned for that exact content;
+        otherwise it is returned while younger than the TTL.
+        """
+        row = self.db.execute(
+            "SELECT content_hash, value, created_at FROM extractions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if digest is not None and row[0] != digest:
+            return None
+        if digest is None and time.time() - row[2] >= self.ttl:
+            return None
+        self.db.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return json.loads(row[1])
+
+    def put_extraction(self, key: str, value: dict, digest: Optional[str] = None):
+        value = json.dumps(value)
+        now = time.time()
+        self.db.execute("INSERT OR REPLACE INTO extractions (key, content_hash, value, created_at, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, digest, value, now, len(value), now))
+        self.db.commit()
+        self.evict()
+
+    def _release_blob(self, digest: str) -> int:
+        """Delete a blob, and the extractions made from it, if no page points at it; returns the bytes freed."""
+        if self.db.execute("SELECT 1 FROM pages WHERE content_hash = ?", (digest,)).fetchone() is not None:
+            return 0
+        blob = self.db.execute("SELECT size FROM blobs WHERE content_hash = ?", (digest,)).fetchone()
+        extractions = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM extractions WHERE content_hash = ?", (digest,)).fetchone()[0]
+        self.db.execute("DELETE FROM blobs WHERE content_hash = ?", (digest,))
+        self.db.execute("DELETE FROM extractions WHERE content_hash = ?", (digest,))
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return (blob[0] if blob else 0) + extractions
+
+    def size(self) -> int:
+        """Bytes held by blobs and extraction results."""
+        return (self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+                + self.db.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0])
+
+    def evict(self):
+        """Drop expired extractions, then least recently used pages and extractions, until the cache fits in max_bytes."""
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        # Results not tied to content (e.g. per-prompt GitHub crawls) are never served past their TTL anyway
+        self.db.execute("DELETE FROM extractions WHERE content_hash IS NULL AND created_at < ?", (time.time() - self.ttl,))
+        total = self.size()
+        # Extractions of content that isn't stored (e.g. pages read from the browser) have no blob to go with
+        candidates = self.db.execute("""
+            SELECT 'page', url, last_used FROM pages
+            UNION ALL
+            SELECT 'extraction', key, last_used FROM extractions
+            WHERE content_hash IS NULL OR content_hash NOT IN (SELECT content_hash FROM blobs)
+            ORDER BY last_used""").fetchall()
+        for kind, key, _ in candidates:
+            if total <= self.max_bytes:
+                break
+            if kind == "page":
+                digest = self.db.execute("SELECT content_hash FROM pages WHERE url = ?", (key,)).fetchone()[0]
+                self.db.execute("DELETE FROM pages WHERE url = ?", (key,))
+                total -= self._release_blob(digest)
+            else:
+                size = self.db.execute("SELECT size FROM extractions WHERE key = ?", (key,)).fetchone()
+                self.db.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                total -= size[0] if size else 0
+        self.db.commit()
+
+    async def fetch(self, http: HttpClient, url: str, headers: Optional[dict] = None) -> Optional[str]:
+        """GET a URL through the cache, revalidating stale entries with ETag/Last-Modified."""
+        cached = self.get(url)
+        if cached is not None and self.is_fresh(cached):
+            return cached.html
+
+        headers = dict(headers or {})
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response = await http.get(url, headers=headers)
+        if response is not None and response.status_code == 304 and cached is not None:
+            self.touch(url)
+            return cached.html
+        if response is None or response.status_code != 200:
+            return None
+        self.put(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.text
+
+    def close(self):
+        self.db.close()
+
+_default_cache: Optional[PageCache] = None
+
+def default_page_cache() -> PageCache:
+    """The process-wide page cache shared by every extractor that doesn't bring its own."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PageCache(
+            os.getenv("BLACKSMITH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "blacksmith", "pages")),
+            ttl=float(os.getenv("BLACKSMITH_CACHE_TTL", str(24 * 3600))),
+            max_bytes=int(os.getenv("BLACKSMITH_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+        )
+    return _default_cache
@@ -0,0 +1,52 @@
+from .github import FILE_MARKER
+
+from typing import Iterator, List
+
+# Rough size of a token in English text and code; good enough for budgeting prompts
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _hard_split(text: str, max_chars: int) -> Iterator[str]:
+    for start in range(0, len(text), max_chars):
+        yield text[start:start + max_chars]
+
+def segments(text: str) -> List[str]:
+    """Split a scraped corpus on the file boundaries GitHub bodies are marked with."""
+    files = text.split("\n\n" + FILE_MARKER)
+    files = [files[0]] + [FILE_MARKER + f for f in files[1:]]
+    return [f for f in files if f.strip()]
+
+def chunk_text(text: str, max_tokens: int = 3000) -> List[str]:
+    """Pack text into chunks of at most max_tokens (estimated).
+
+    Whole files and paragraphs are kept together when they fit; a file that is
+    too big is split on paragraphs, then lines, and only then mid-line.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks, current = [], ""
+
+    def add(piece: str, separator: str):
+        nonlocal current
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = current + separator + piece if current else piece
+
+    for segment in segments(text):
+        if len(segment) <= max_chars:
+            add(segment, "\n\n")
+            continue
+        for paragraph in segment.split("\n\n"):
+            if not paragraph.strip():
+                continue
+            if len(paragraph) <= max_chars:
+                add(paragraph, "\n\n")
+                continue
+            for line in paragraph.split("\n"):
+                for piece in _hard_split(line, max_chars):
+                    add(piece, "\n")
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,170 @@
+from .chunking import estimate_tokens
+from .document import ParsedPage
+
+import re
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional
+
+ElementKind = Literal["link", "input", "button"]
+
+# Where a page's own content usually lives, most specific first
+MAIN_CONTAINERS = ["#mw-content-text", "main", "[role=main]", "article", "#content"]
+PLAIN_ID = re.compile(r"^[A-Za-z][\w-]*$")
+
+def css_path(element) -> str:
+    """A CSS selector matching just element: a chain of nth-of-type steps up to the nearest ancestor with an id."""
+    parts = []
+    while element is not None and element.name != "[document]":
+        element_id = element.get("id")
+        if element_id:
+            parts.append(f"#{element_id}" if PLAIN_ID.match(element_id) else f'[id="{element_id}"]')
+            break
+        index = 1 + sum(1 for _ in element.find_previous_siblings(element.name))
+        parts.append(f"{element.name}:nth-of-type({index})")
+        element = element.parent
+    return " > ".join(reversed(parts))
+
+def _clean(text: Optional[str], limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+@dataclass
+class PageElement:
+    id: int
+    kind: ElementKind
+    label: str
+    url: Optional[str] = None
+    selector: Optional[str] = None
+    in_main: bool = False
+
+    def __str__(self):
+        return f"[{self.id}] {self.kind}: {self.label}" + (f" -> {self.url}" if self.url else "")
+
+@dataclass
+class PageOutline:
+    url: str
+    title: str
+    headings: List[str] = field(default_factory=list)
+    snippets: List[str] = field(default_factory=list)
+    # Every actionable element on the page, by id; `shown` are the ones that fit the budget
+    elements: Dict[int, PageElement] = field(default_factory=dict)
+    shown: List[int] = field(default_factory=list)
+
+    def element(self, element_id: int) -> Optional[PageElement]:
+        return self.elements.get(element_id)
+
+    def render(self, elements: bool = True) -> str:
+        """The outline as prompt text; without elements, just what the page is about, for deciding whether it's done."""
+        lines = [f"URL: {self.url}", f"TITLE: {self.title}"]
+        if self.headings:
+            lines.append("HEADINGS:")
+            lines.extend(f"- {heading}" for heading in self.headings)
+        if self.snippets:
+            lines.append("TEXT:")
+            lines.extend(f"- {snippet}" for snippet in self.snippets)
+        if not elements:
+            return "\n".join(lines)
+        lines.append("ELEMENTS:")
+        lines.extend(str(self.elements[element_id]) for element_id in self.shown)
+        if len(self.shown) < len(self.elements):
+            lines.append(f"({len(self.elements) - len(self.shown)} more elements not shown)")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.render()
+
+class PageCondenser:
+    """Turns a page into a short outline for LLM prompts instead of its markup.
+
+    The outline has the title, headings, the first paragraphs of the main
+    content and a numbered list of the links, inputs and buttons an action can
+    target. Elements are numbered in document order before anything is cut,
+    so an element keeps its id however small the budget is. Within
+    `max_tokens`, headings get a fifth of the budget, text snippets two fifths
+    of what's left and elements the rest, with elements in the main content
+    listed before navigation and footers.
+    """
+
+    def __init__(self, max_tokens: int = 600, max_snippets: int = 8, snippet_chars: int = 280, label_chars: int = 80):
+        self.max_tokens = max_tokens
+        self.max_snippets = max_snippets
+        self.snippet_chars = snippet_chars
+        self.label_chars = label_chars
+
+    def main_container(self, page: ParsedPage):
+        for selector in MAIN_CONTAINERS:
+            container = page.soup.select_one(selector)
+            if container is not None:
+                return container
+        return None
+
+    def elements(self, page: ParsedPage, main) -> List[PageElement]:
+        elements, seen_urls = [], set()
+        for tag in page.soup.find_all(["a", "input", "textarea", "select", "button"]):
+            in_main = main is not None and (tag is main or any(parent is main for parent in tag.parents))
+            if tag.name == "a":
+                if not tag.get("href"):
+                    continue
+                url = urllib.parse.urldefrag(urllib.parse.urljoin(page.url, tag["href"]))[0]
+                if not url.startswith(("http://", "https://")) or url == page.url or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                image = tag.find("img")
+                label = tag.get_text(" ") or tag.get("aria-label") or tag.get("title") or (image.get("alt") if image else "")
+                elements.append(PageElement(len(elements) + 1, "link", _clean(label, self.label_chars) or url, url=url, in_main=in_main))
+                continue
+
+            input_type = (tag.get("type") or "").lower()
+            if input_type == "hidden" or tag.has_attr("disabled"):
+                continue
+            kind = "button" if tag.name == "button" or input_type in ("submit", "button", "reset", "image") else "input"
+            label = (tag.get("aria-label") or tag.get("placeholder") or tag.get("value") or tag.get_text(" ")
+                     or tag.get("title") or tag.get("name") or input_type or tag.name)
+            elements.append(PageElement(len(elements) + 1, kind, _clean(label, self.label_chars), selector=css_path(tag), in_main=in_main))
+        return elements
+
+    def condense(self, page: ParsedPage) -> PageOutline:
+        main = self.main_container(page)
+        title = page.title() or (page.soup.title.get_text(strip=True) if page.soup.title else "")
+        outline = PageOutline(url=page.url, title=_clean(title, self.label_chars * 2))
+        # Leave room for the note on how many elements were left out
+        budget = self.max_tokens - estimate_tokens(outline.render()) - 10
+
+        heading_budget = budget // 5
+        for heading in page.headers():
+            heading = _clean(heading, self.label_chars)
+            cost = estimate_tokens(heading) + 1
+            if not heading or heading in outline.headings:
+                continue
+            if cost > heading_budget:
+                break
+            outline.headings.append(heading)
+            heading_budget -= cost
+            budget -= cost
+
+        snippet_budget = budget * 2 // 5
+        for paragraph in (main or page.soup).find_all("p"):
+            if len(outline.snippets) >= self.max_snippets:
+                break
+            text = " ".join(paragraph.get_text(" ").split())
+            snippet = _clean(text, self.snippet_chars)
+            if len(text) < 40 or snippet in outline.snippets or paragraph.find_parent(class_="infobox"):
+                continue
+            cost = estimate_tokens(snippet) + 1
+            if cost > snippet_budget:
+                break
+            outline.snippets.append(snippet)
+            snippet_budget -= cost
+            budget -= cost
+
+        elements = self.elements(page, main)
+        outline.elements = {element.id: element for element in elements}
+        for element in sorted(elements, key=lambda element: not element.in_main):
+            cost = estimate_tokens(str(element)) + 1
+            if cost > budget:
+                break
+            outline.shown.append(element.id)
+            budget -= cost
+        outline.shown.sort()
+        return outline
@@ -0,0 +1,111 @@
+from .cache import content_hash
+from .chunking import CHARS_PER_TOKEN, chunk_text
+
+import os
+import sqlite3
+from typing import Iterator, List, Optional
+
+def corpus_path(job_id: str, corpus_dir: Optional[str] = None) -> str:
+    """Where a job's corpus lives; nothing is created until a CorpusStore opens it."""
+    corpus_dir = corpus_dir or os.getenv("BLACKSMITH_CORPUS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "blacksmith", "corpora"))
+    return os.path.join(corpus_dir, f"{job_id}.sqlite")
+
+class CorpusStore:
+    """Append-only store of everything a scrape extracted, one SQLite file per job.
+
+    Each page's text is split into chunks of at most `chunk_tokens` when it is
+    appended and indexed by URL and content hash, so a page is stored once even
+    if several URLs lead to it. Chunks are read back lazily in the order they
+    were scraped, and because every append is committed straight away a store
+    reopened after a crash still has every page scraped before it.
+    """
+
+    def __init__(self, path: str = ":memory:", chunk_tokens: int = 3000):
+        self.path = path
+        self.chunk_tokens = chunk_tokens
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                content_hash TEXT NOT NULL,
+                timestamp TEXT,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_content_hash ON pages (content_hash);
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_url ON chunks (url);
+        """)
+        self.db.commit()
+
+    @classmethod
+    def for_job(cls, job_id: str, corpus_dir: Optional[str] = None) -> "CorpusStore":
+        return cls(corpus_path(job_id, corpus_dir))
+
+    def has_url(self, url: str) -> bool:
+        return self.db.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    def append(self, url: str, title: Optional[str], text: str, timestamp: Optional[str] = None) -> bool:
+        """Chunk and store the text of a page; False if the page or its text is already stored."""
+        if not text or not text.strip() or self.has_url(url):
+            return False
+        digest = content_hash(text)
+        if self.db.execute("SELECT 1 FROM pages WHERE content_hash = ?", (digest,)).fetchone() is not None:
+            return False
+        with self.db:
+            self.db.execute("INSERT INTO pages (url, title, content_hash, timestamp, size) VALUES (?, ?, ?, ?, ?)",
+                            (url, title, digest, timestamp, len(text)))
+            self.db.executemany("INSERT INTO chunks (url, position, text) VALUES (?, ?, ?)",
+                                [(url, position, chunk) for position, chunk in enumerate(chunk_text(text, self.chunk_tokens))])
+        return True
+
+    def urls(self) -> List[str]:
+        return [row[0] for row in self.db.execute("SELECT url FROM pages ORDER BY rowid")]
+
+    def size(self) -> int:
+        """Total characters of text stored."""
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def chunks(self, max_tokens: Optional[int] = None, batch_size: int = 64) -> Iterator[str]:
+        """Yield stored chunks in scrape order, reading a batch at a time.
+
+        With max_tokens, consecutive chunks (small pages, typically) are packed
+        together up to that budget so callers get as few chunks as possible,
+        and stored chunks bigger than the budget are split to fit it.
+        """
+        max_chars = (max_tokens or self.chunk_tokens) * CHARS_PER_TOKEN
+        current, last_id = "", 0
+        while True:
+            rows = self.db.execute("SELECT id, text FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for last_id, stored in rows:
+                if max_tokens is None:
+                    yield stored
+                    continue
+                pieces = chunk_text(stored, max_tokens) if len(stored) > max_chars else [stored]
+                for text in pieces:
+                    if current and len(current) + 2 + len(text) > max_chars:
+                        yield current
+                        current = text
+                    else:
+                        current = current + "\n\n" + text if current else text
+        if current:
+            yield current
+
+    def text(self) -> str:
+        """The whole corpus as one string; only for small scrapes."""
+        return "\n\n".join(self.chunks())
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self.db.close()
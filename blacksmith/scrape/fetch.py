@@ -0,0 +1,103 @@
+from ..metrics import Metrics, metrics as default_metrics
+from .cache import PageCache, default_page_cache
+from .http_pool import HttpClient, default_http_client
+
+import html
+import json
+import re
+import urllib.parse
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+FetchPath = Literal["cache", "mediawiki", "http", "browser"]
+
+@dataclass
+class FetchResult:
+    url: str
+    html: str
+    path: FetchPath
+
+class PageFetcher:
+    """Fetches pages over plain HTTP when they don't need a browser.
+
+    Tries, in order: a fresh copy in the page cache, the MediaWiki parse API for
+    Wikipedia articles, and a pooled HTTP GET. If the page looks like it needs
+    JavaScript to render, `fetch_static` returns None and the caller should fall
+    back to the Selenium Worker. Every page served is counted per path so we can
+    see how often the browser is actually needed.
+    """
+
+    WIKIPEDIA_ARTICLE = re.compile(r"https?://([a-z\-]+)\.(?:m\.)?wikipedia\.org/wiki/([^?#]+)")
+    APP_SHELL = re.compile(r'<div[^>]+id="(?:root|app|__next|__nuxt)"[^>]*>\s*</div>', re.IGNORECASE)
+    SCRIPTS = re.compile(r"<(script|style|noscript)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+    TAGS = re.compile(r"<[^>]+>")
+
+    def __init__(self,
+                 http: Optional[HttpClient] = None,
+                 cache: Optional[PageCache] = None,
+                 metrics: Optional[Metrics] = None,
+                 min_text_length: int = 200):
+        self.http = http or default_http_client()
+        self.cache = cache or default_page_cache()
+        self.metrics = metrics or default_metrics
+        self.min_text_length = min_text_length
+
+    def record(self, path: FetchPath):
+        self.metrics.incr(f"fetch.{path}")
+
+    def path_fractions(self) -> dict:
+        """Fraction of pages served by each fetch path so far."""
+        paths = ["cache", "mediawiki", "http", "browser"]
+        counts = {path: self.metrics.counters.get(f"fetch.{path}", 0) for path in paths}
+        total = sum(counts.values()) or 1
+        return {path: count / total for path, count in counts.items()}
+
+    def needs_javascript(self, page_source: str) -> bool:
+        if self.APP_SHELL.search(page_source):
+            return True
+        text = self.TAGS.sub(" ", self.SCRIPTS.sub(" ", page_source))
+        return len(" ".join(text.split())) < self.min_text_length
+
+    async def fetch_mediawiki(self, url: str) -> Optional[str]:
+        """Fetch a Wikipedia article's rendered content via the MediaWiki parse API."""
+        match = self.WIKIPEDIA_ARTICLE.match(url)
+        if match is None:
+            return None
+        lang, title = match.groups()
+        api_url = f"https://{lang}.wikipedia.org/w/api.php?" + urllib.parse.urlencode({
+            "action": "parse",
+            "page": urllib.parse.unquote(title),
+            "prop": "text|displaytitle",
+            "format": "json",
+            "formatversion": "2",
+            "redirects": "1",
+        })
+        response = await self.cache.fetch(self.http, api_url)
+        if response is None:
+            return None
+        parsed = json.loads(response).get("parse")
+        if parsed is None:
+            return None
+        # Wrap the article in the same ids the full page uses so extractors treat both alike
+        title = html.escape(parsed.get("title", ""))
+        return (f'<html><head><title>{title}</title></head><body>'
+                f'<h1 id="firstHeading">{title}</h1>'
+                f'<div id="mw-content-text">{parsed["text"]}</div></body></html>')
+
+    async def fetch_static(self, url: str) -> Optional[FetchResult]:
+        """Fetch url without a browser, or return None if it needs one."""
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.is_fresh(cached) and not self.needs_javascript(cached.html):
+            self.record("cache")
+            return FetchResult(url, cached.html, "cache")
+
+        article = await self.fetch_mediawiki(url)
+        if article is not None:
+            self.record("mediawiki")
+            return FetchResult(url, article, "mediawiki")
+
+        page_source = await self.cache.fetch(self.http, url)
+        if page_source is None or self.needs_javascript(page_source):
+            return None
+        self.record("http")
+        return FetchResult(url, page_source, "http")
@@ -0,0 +1,57 @@
+import asyncio
+import time
+import urllib.parse
+from dataclasses import dataclass
+from typing import Optional, Set
+
+@dataclass
+class Candidate:
+    url: str
+    depth: int
+
+class Frontier:
+    """The set of candidate URLs still to explore, shared by every branch of a scrape.
+
+    URLs are visited breadth-first and never twice. The frontier also enforces
+    the job's budget: once `max_pages` have been handed out or `time_budget`
+    seconds have passed it stops handing out work.
+    """
+
+    def __init__(self, max_pages: int = 20, time_budget: float = 120, max_depth: int = 3):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.deadline = time.monotonic() + time_budget
+        self.queue: asyncio.Queue[Candidate] = asyncio.Queue()
+        self.seen: Set[str] = set()
+        self.visited = 0
+
+    @staticmethod
+    def normalize(url: str) -> str:
+        return urllib.parse.urldefrag(url)[0].rstrip("/")
+
+    def push(self, url: str, depth: int) -> bool:
+        """Queue url unless it was already seen or is past the depth limit."""
+        key = self.normalize(url)
+        if depth > self.max_depth or key in self.seen or not url.startswith(("http://", "https://")):
+            return False
+        self.seen.add(key)
+        self.queue.put_nowait(Candidate(url, depth))
+        return True
+
+    def exhausted(self) -> bool:
+        return self.visited >= self.max_pages or time.monotonic() >= self.deadline
+
+    def remaining_time(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    async def next(self) -> Optional[Candidate]:
+        """Take the next candidate, or None once the budget is spent."""
+        candidate = await self.queue.get()
+        if self.exhausted():
+            self.queue.task_done()
+            return None
+        self.visited += 1
+        return candidate
+
+    def done(self):
+        self.queue.task_done()
@@ -0,0 +1,140 @@
+from .cache import PageCache
+from .http_pool import HttpClient, default_http_client
+
+import asyncio
+import json
+import os
+import urllib.parse
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from bs4 import BeautifulSoup
+
+GITHUB_BASE_URL = "https://github.com"
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_RAW_BASE_URL = "https://raw.githubusercontent.com"
+# Starts each file's text in an extracted Body so later stages can split on file boundaries
+FILE_MARKER = "File: "
+
+@dataclass
+class RepoLocation:
+    owner: str
+    repo: str
+    ref: Optional[str] = None
+    path: str = ""
+
+    @classmethod
+    def from_url(cls, url: str) -> "RepoLocation":
+        """Parse github.com/<owner>/<repo>[/tree|blob/<ref>/<path>] URLs."""
+        parts = [p for p in urllib.parse.urlparse(url).path.split("/") if p]
+        location = cls(owner=parts[0], repo=parts[1].removesuffix(".git"))
+        if len(parts) >= 4 and parts[2] in ("tree", "blob"):
+            location.ref = parts[3]
+            location.path = "/".join(parts[4:])
+        return location
+
+    def raw_url(self, path: str) -> str:
+        return f"{GITHUB_RAW_BASE_URL}/{self.owner}/{self.repo}/{self.ref or 'HEAD'}/{path}"
+
+class GithubCrawler:
+    """Enumerates and downloads a repository's files concurrently over a shared HTTP pool.
+
+    The whole repository is listed with one call to the git trees API; if that
+    fails (e.g. rate limited) we fall back to walking the HTML `/tree/` pages
+    concurrently. Files that fail to download are skipped instead of aborting
+    the crawl. With a PageCache, the listing and raw files are revalidated with
+    ETag/Last-Modified instead of being downloaded again.
+    """
+
+    def __init__(self, http: Optional[HttpClient] = None, concurrency: int = 16, cache: Optional[PageCache] = None):
+        self.http = http or default_http_client()
+        self.concurrency = concurrency
+        self.cache = cache
+        token = os.getenv("GITHUB_TOKEN")
+        self.api_headers = {"Accept": "application/vnd.github+json"}
+        if token:
+            self.api_headers["Authorization"] = f"Bearer {token}"
+
+    async def get_text(self, url: str, headers: Optional[dict] = None) -> Optional[str]:
+        """GET a URL's body through the cache when there is one; None on failure."""
+        if self.cache is not None:
+            return await self.cache.fetch(self.http, url, headers=headers)
+        response = await self.http.get(url, headers=headers)
+        if response is None or response.status_code != 200:
+            return None
+        return response.text
+
+    @staticmethod
+    def matches(path: str, file_types: List[str]) -> bool:
+        return any(path.endswith(file_type.strip()) for file_type in file_types if file_type.strip())
+
+    async def list_files(self, location: RepoLocation, file_types: List[str]) -> List[str]:
+        """List file paths in the repository (under location.path) with a wanted extension."""
+        url = f"{GITHUB_API_URL}/repos/{location.owner}/{location.repo}/git/trees/{location.ref or 'HEAD'}?recursive=1"
+        listing = await self.get_text(url, headers=self.api_headers)
+        if listing is None:
+            print(f"Git trees API unavailable for {url}, walking HTML pages instead")
+            return await self.walk_tree_pages(location, file_types)
+
+        tree = json.loads(listing)
+        if tree.get("truncated"):
+            print(f"Git tree listing for {location.owner}/{location.repo} was truncated")
+        prefix = location.path.rstrip("/") + "/" if location.path else ""
+        return [item["path"] for item in tree.get("tree", [])
+                if item["type"] == "blob" and item["path"].startswith(prefix) and self.matches(item["path"], file_types)]
+
+    async def walk_tree_pages(self, location: RepoLocation, file_types: List[str]) -> List[str]:
+        """Fallback listing that scrapes github.com `/tree/` pages, fetching sibling directories concurrently."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        repo_prefix = f"/{location.owner}/{location.repo}/"
+
+        async def walk(url: str) -> List[str]:
+            async with semaphore:
+                html = await self.get_text(url)
+            if html is None:
+                print(f"Failed to fetch {url}")
+                return []
+            soup = BeautifulSoup(html, "html.parser")
+
+            files, subdirs = [], []
+            for item in soup.select("a.Link--primary[href]"):
+                href = item["href"]
+                if not href.startswith(repo_prefix):
+                    continue
+                kind, _, rest = href[len(repo_prefix):].partition("/")
+                if kind == "tree":
+                    subdirs.append(GITHUB_BASE_URL + href)
+                elif kind == "blob":
+                    ref, _, path = rest.partition("/")
+                    location.ref = location.ref or ref
+                    if self.matches(path, file_types):
+                        files.append(path)
+            for nested in await asyncio.gather(*(walk(subdir) for subdir in subdirs)):
+                files.extend(nested)
+            return files
+
+        start = f"{GITHUB_BASE_URL}/{location.owner}/{location.repo}"
+        if location.ref:
+            start += f"/tree/{location.ref}/{location.path}".rstrip("/")
+        return sorted(set(await walk(start)))
+
+    async def fetch_files(self, location: RepoLocation, paths: List[str]) -> List[Tuple[str, str]]:
+        """Download raw file contents concurrently, skipping files that fail."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(path: str) -> Optional[Tuple[str, str]]:
+            async with semaphore:
+                text = await self.get_text(location.raw_url(path))
+            if text is None:
+                print(f"Failed to fetch {path}")
+                return None
+            return path, text
+
+        results = await asyncio.gather(*(fetch(path) for path in paths))
+        return [result for result in results if result is not None]
+
+    async def crawl(self, url: str, file_types: List[str]) -> List[Tuple[str, str]]:
+        """Return (path, contents) for every wanted file in the repository at url."""
+        location = RepoLocation.from_url(url)
+        paths = await self.list_files(location, file_types)
+        print(f"Found {len(paths)} matching files in {location.owner}/{location.repo}")
+        return await self.fetch_files(location, paths)
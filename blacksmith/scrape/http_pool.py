@@ -0,0 +1,89 @@
+import asyncio
+import random
+import time
+import urllib.parse
+from typing import Dict, Optional
+
+import httpx
+
+class HostRateLimiter:
+    """Spaces out requests to each host so no host sees more than `rate` requests per second."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, default_rate: Optional[float] = None):
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self._next_slot: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def wait(self, host: str):
+        rate = self.rates.get(host, self.default_rate)
+        if not rate:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1 / rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class HttpClient:
+    """A shared, keep-alive HTTP connection pool with per-host pacing and retries."""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self,
+                 max_connections: int = 64,
+                 rate_limiter: Optional[HostRateLimiter] = None,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 timeout: float = 20.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": "Mozilla/5.0"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport,
+        )
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.retries = retries
+        self.backoff = backoff
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return float(response.headers["Retry-After"])
+        return self.backoff * (2 ** attempt) * (1 + random.random())
+
+    async def get(self, url: str, headers: Optional[dict] = None, params: Optional[dict] = None) -> Optional[httpx.Response]:
+        """GET a URL, retrying transient failures. Returns None if every attempt failed."""
+        host = urllib.parse.urlparse(url).netloc
+        response = None
+        for attempt in range(self.retries + 1):
+            await self.rate_limiter.wait(host)
+            try:
+                response = await self.client.get(url, headers=headers, params=params)
+                if response.status_code not in self.RETRY_STATUSES:
+                    return response
+            except httpx.TransportError as e:
+                print(f"Failed to fetch {url}: {e}")
+                response = None
+            if attempt < self.retries:
+                await asyncio.sleep(self._delay(attempt, response))
+        return response
+
+    async def close(self):
+        await self.client.aclose()
+
+_default_client: Optional[HttpClient] = None
+
+def default_http_client() -> HttpClient:
+    """The process-wide HTTP pool shared by every extractor that doesn't bring its own."""
+    global _default_client
+    if _default_client is None:
+        _default_client = HttpClient(rate_limiter=HostRateLimiter({
+            "github.com": 5,
+            "api.github.com": 10,
+            "raw.githubusercontent.com": 50,
+        }))
+    return _default_client
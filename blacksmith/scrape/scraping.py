@@ -1,25 +1,38 @@
+from ..llm import LLMGateway, default_llm_gateway
+from ..metrics import metrics
 from ..parse import Prompt
+from ..progress import ProgressChannel
+from .actions import ACTION_TOOLS, Action, ActionError, parse_action, perform, validate
+from .condense import PageCondenser, PageOutline
+from .browser_pool import BrowserPool, PooledBrowser, default_browser_pool
+from .cache import PageCache, content_hash, default_page_cache
+from .corpus import CorpusStore
+from .document import ParsedPage
+from .fetch import FetchResult, PageFetcher
+from .frontier import Frontier
+from .github import FILE_MARKER, GithubCrawler
 
 import asyncio
-from typing import Literal, Optional, List
-from dataclasses import dataclass
-from openai import AsyncOpenAI
-from selenium import webdriver
-from bs4 import BeautifulSoup
-import time
+import json
+import os
+from typing import Dict, Literal, Optional, List
+from dataclasses import dataclass, asdict
 from datetime import datetime
-import urllib
-import requests
 import re
-from tqdm import tqdm
+
+PlannerMode = Literal["two_call", "fused"]
 
 class AutomationState:
-    def __init__(self):
-        self.client = AsyncOpenAI()
+    def __init__(self, llm: Optional[LLMGateway] = None):
+        self.llm = llm or default_llm_gateway()
         self.last_error: Optional[str] = None
         self.page_source: Optional[str] = None
         self.current_url: Optional[str] = None
         self.header_content: Optional[str] = None
+        # The current page condensed for prompts: headings, text snippets and numbered elements
+        self.page_outline: Optional[str] = None
+        # The same outline without its elements, for prompts that don't pick an action
+        self.page_summary: Optional[str] = None
         self.body_content: Optional[str] = None
 
     async def summarize(self):
@@ -51,14 +64,15 @@ header_content: {self.header_content}
 body_content: {self.body_content}
 """
 
-        summary = await self.client.chat.completions.create(
+        if self.body_content is None:
+            return "Extracting content..."
+
+        summary = await self.llm.chat(
+            "state.summarize",
             model="gpt-4o-mini-2024-07-18",
             messages=[{"role": "user", "content": prompt + prompt_info}]
         )
         summary = summary.choices[0].message.content.strip()
-
-        if self.body_content is None:
-            return "Extracting content..."
         return summary
 @dataclass
 class ThinkingStep:
@@ -75,8 +89,8 @@ class ThinkingStep:
             self.context = response.replace("NOT_DONE:", "")
 
 class Thinker:
-    def __init__(self):
-        self.client = AsyncOpenAI()
+    def __init__(self, llm: Optional[LLMGateway] = None):
+        self.llm = llm or default_llm_gateway()
 
     def is_relevant(self, state: AutomationState, prompt: Prompt) -> bool:
         irrelevant_substrings = ["https://www.google", "https://www.bing"]
@@ -86,18 +100,14 @@ class Thinker:
         return True
 
     async def think(self, state: AutomationState, prompt: Prompt) -> ThinkingStep:
-        content_for_review = state.header_content
-        if hasattr(state, 'detailed_content') and state.body_content:
-            content_for_review = state.body_content
-
         thinking_prompt = f"""
         You are a web automation strategist. Analyze current state and decide next step.
         
         TASK: {prompt.webscraping_prompt}
         CURRENT URL: {state.current_url}
-        CONTENT: {content_for_review}
         LAST ERROR: {state.last_error}
-        PAGE CONTENT: {state.header_content}
+        PAGE:
+{state.page_summary or state.header_content}
 
 
         If this page has relevant information:
@@ -110,25 +120,145 @@ class Thinker:
         NOT_DONE: [provide information on what's missing and where to go next]
         """
 
-        response = await self.client.chat.completions.create(
+        response = await self.llm.chat(
+            "thinker.think",
+            cache=True,
             model="gpt-4o-mini-2024-07-18",
             messages=[{"role": "system", "content": thinking_prompt}]
         )
 
         return ThinkingStep(response=response.choices[0].message.content.strip())
 
-@dataclass
-class ActionStep:
-    action: str
+    LINK_TOOLS = [
+        {
+            "type": "function",
+            "function": {
+                "name": "follow_links",
+                "description": "Choose which links to explore next for the scraping task",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "urls": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Most promising URLs to visit next, best first"
+                        }
+                    },
+                    "required": ["urls"],
+                    "additionalProperties": False
+                }
+            }
+        }
+    ]
+
+    async def propose_links(self, prompt: Prompt, page: Optional[ParsedPage] = None, max_links: int = 4, max_candidates: int = 150) -> List[str]:
+        """Pick up to max_links URLs worth exploring from page (or starting URLs if there is no page yet)."""
+        if page is None:
+            where = "No page has been visited yet. Suggest starting URLs (prefer Wikipedia articles) that contain the data."
+        else:
+            candidates = "\n".join(f"- {text}: {url}" for text, url in page.links()[:max_candidates])
+            where = f"CURRENT URL: {page.url}\nLINKS ON THIS PAGE:\n{candidates}"
+
+        link_prompt = f"""
+        You are a web automation strategist exploring several pages in parallel to collect data.
+
+        TASK: {prompt.webscraping_prompt}
+        {where}
 
-    def __init__(self, action: str):
-        self.action = self.clean_selenium_command(action)
+        Call follow_links with up to {max_links} URLs that are most likely to contain data for the task.
+        Return an empty list if nothing here is worth following.
+        """
 
-    def clean_selenium_command(self, action):
-        # Remove code block markers and whitespace
-        cleaned = action.strip()
-        cleaned = cleaned.replace('python', '')
-        return cleaned.strip()
+        response = await self.llm.chat(
+            "thinker.propose_links",
+            model="gpt-4o-mini-2024-07-18",
+            messages=[{"role": "system", "content": link_prompt}],
+            tools=self.LINK_TOOLS,
+            tool_choice={"type": "function", "function": {"name": "follow_links"}},
+        )
+
+        urls = []
+        for tool_call in response.choices[0].message.tool_calls or []:
+            try:
+                urls.extend(json.loads(tool_call.function.arguments).get("urls", []))
+            except json.JSONDecodeError as e:
+                print(f"Could not parse proposed links: {e}")
+        return urls[:max_links]
+
+    # browser_action's parameters plus the DONE/NOT_DONE decision, so one call both thinks and acts
+    PLAN_TOOLS = [
+        {
+            "type": "function",
+            "function": {
+                "name": "plan_step",
+                "description": "Decide whether the task is done and, if not, the next browser action",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "status": {
+                            "type": "string",
+                            "enum": ["DONE", "NOT_DONE"],
+                            "description": "DONE once a page with all necessary information for the task has been reached"
+                        },
+                        "reason": {
+                            "type": "string",
+                            "description": "What this page provides, or what is missing and where to go next"
+                        },
+                        **ACTION_TOOLS[0]["function"]["parameters"]["properties"],
+                    },
+                    "required": ["status", "reason"],
+                    "additionalProperties": False
+                }
+            }
+        }
+    ]
+
+    async def plan(self, state: AutomationState, prompt: Prompt) -> tuple[ThinkingStep, Optional[Action]]:
+        """Decide DONE/NOT_DONE and the next action in a single call, instead of think then get_action.
+
+        Like think, this only looks at the page outline, so it can run while
+        the page's body is still being extracted.
+        """
+        plan_prompt = f"""
+        You are a web automation strategist. Analyze current state, decide whether the task is done
+        and, if it isn't, choose the next browser action.
+
+        TASK: {prompt.webscraping_prompt}
+        CURRENT URL: {state.current_url}
+        LAST ERROR: {state.last_error}
+        PAGE:
+{state.page_outline or state.header_content}
+
+        Call plan_step once. With NOT_DONE, also give exactly one action, referring to links,
+        inputs and buttons of the page by their [id] in `element`.
+        """
+
+        response = await self.llm.chat(
+            "thinker.plan",
+            cache=True,
+            model="gpt-4o-mini-2024-07-18",
+            messages=[{"role": "system", "content": plan_prompt}],
+            tools=self.PLAN_TOOLS,
+            tool_choice={"type": "function", "function": {"name": "plan_step"}},
+        )
+
+        for tool_call in response.choices[0].message.tool_calls or []:
+            if tool_call.function.name != "plan_step":
+                continue
+            try:
+                arguments = json.loads(tool_call.function.arguments)
+            except json.JSONDecodeError as e:
+                raise ActionError(f"Malformed plan_step arguments: {e}")
+            status = "DONE" if arguments.get("status") == "DONE" else "NOT_DONE"
+            step = ThinkingStep(f"{status}: {arguments.get('reason', '')}")
+            if step.next_step == "DONE":
+                return step, None
+            return step, Action.from_arguments(arguments)
+        raise ActionError("The model did not return a plan_step call")
+
+@dataclass
+class ActionStep:
+    action: Action
 
 @dataclass
 class Header:
@@ -143,108 +273,66 @@ class Body:
     timestamp: str
 
 class ContentExtractor:
-    GITHUB_BASE_URL = "https://github.com"
-    GITHUB_RAW_BASE_URL = "https://raw.githubusercontent.com"
-
-    def __init__(self):
-        self.client = AsyncOpenAI()
+    def __init__(self, github_crawler: Optional[GithubCrawler] = None, page_cache: Optional[PageCache] = None, llm: Optional[LLMGateway] = None):
+        self.llm = llm or default_llm_gateway()
+        self.page_cache = page_cache or default_page_cache()
+        self.github_crawler = github_crawler or GithubCrawler(cache=self.page_cache)
 
-    def extract_headers(self, state: AutomationState, page_url: str, page_source: str) -> Header:
+    def extract_headers(self, state: AutomationState, page: ParsedPage) -> Header:
         """Initial quick scan of page - just headers and basic content"""
 
-        state.current_url = page_url
+        state.current_url = page.url
 
-        soup = BeautifulSoup(page_source, 'html.parser')
-        headers = [h.text for h in soup.find_all(['h1', 'h2', 'h3'])]
-        
-        return Header(url=page_url, headers=headers)
+        key = f"headers:{page.url}"
+        cached = self.page_cache.get_extraction(key, page.content_hash)
+        if cached is not None:
+            return Header(**cached)
 
-    async def extract_body(self, page_url: str, page_source: str, prompt: Prompt) -> Body:
-        if (re.match(r"https://github.com/[^\s]+/[^\s]+", page_url)):
-        # if (page_url.startswith(ContentExtractor.GITHUB_BASE_URL)):
-            return await self.extract_github_content(page_url, prompt)
-        soup = BeautifulSoup(page_source, 'html.parser')
-        
-        title = soup.find(id="firstHeading").text if soup.find(id="firstHeading") else ""
-
-        # Get main content
-        content_div = soup.find(id="mw-content-text")
-        if content_div:
-            # Find the first few paragraphs of actual content
-            main_paragraphs = []
-            for p in content_div.find_all('p', recursive=True):
-                if p.text.strip() and not p.find_parent(class_='infobox'):
-                    main_paragraphs.append(p.text.strip())
-                if len(main_paragraphs) >= 3:  # Get first 3 substantive paragraphs
-                    break
+        header = Header(url=page.url, headers=page.headers())
+        self.page_cache.put_extraction(key, asdict(header), page.content_hash)
+        return header
+
+    async def extract_body(self, page: ParsedPage, prompt: Prompt) -> Body:
+        if (re.match(r"https://github.com/[^\s]+/[^\s]+", page.url)):
+            return await self.extract_github_content(page.url, prompt)
+
+        key = f"body:{page.url}"
+        cached = self.page_cache.get_extraction(key, page.content_hash)
+        if cached is not None:
+            return Body(**cached) if cached else None
 
+        # Get the first 3 substantive paragraphs of the main content
+        body = None
+        main_paragraphs = page.paragraphs("mw-content-text", limit=3)
+        if main_paragraphs is not None:
             main_text = '\n\n'.join(main_paragraphs)
 
-            return Body(url=page_url, 
-                        title=title, 
+            body = Body(url=page.url, 
+                        title=page.title(), 
                         main_text=main_text, 
                         timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"))
 
-    async def extract_github_content(self, page_url: str, prompt: Prompt, base_path="", file_type="") -> Body:
-        print("Extracting GitHub content...")
-        def convert_to_raw_link(blob_url):
-            parts = urllib.parse.urlparse(blob_url)
-            path_parts = parts.path.split("/")
-            raw_path = "/".join(path_parts[3:])
-            raw_link = f"{ContentExtractor.GITHUB_RAW_BASE_URL}/{path_parts[1]}/{path_parts[2]}/{raw_path}"
-            return raw_link
-
-        def get_soup(url):
-            headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200:
-                print(f"Failed to fetch {url} (Status Code: {response.status_code})")
-                return None
-            return BeautifulSoup(response.text, "html.parser")
-
-        def get_files(repo_url, base_path="", file_types=[]):
-            soup = get_soup(repo_url)
-            if not soup:
-                return []
-
-            files_list = []
-
-            items = soup.select("a.Link--primary[href]")
-
-            for item in tqdm(items):
-                relative_link = item["href"]
-                full_link = ContentExtractor.GITHUB_BASE_URL + relative_link
-
-                if "/tree/" in full_link:  
-                    files_list.extend(get_files(full_link, base_path + "/" + relative_link.split("/")[-1], file_types))
-                elif "/blob/" in full_link:  
-                    raw_file_link = convert_to_raw_link(full_link)
-                    for file_type in file_types:
-                        if (full_link.endswith(file_type)):
-                            files_list.append(raw_file_link)
-
-            return files_list
+        self.page_cache.put_extraction(key, asdict(body) if body else {}, page.content_hash)
+        return body
+
+    async def extract_github_content(self, page_url: str, prompt: Prompt) -> Body:
+        key = f"github:{page_url}:{content_hash(prompt.webscraping_prompt)}"
+        cached = self.page_cache.get_extraction(key)
+        if cached is not None:
+            print("Using cached GitHub content")
+            return Body(**cached)
 
+        print("Extracting GitHub content...")
         file_types = await self.determine_file_extension(prompt)
-        files_list = get_files(page_url, base_path, file_types)
-        main_text = []
-        for file in files_list:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(file, headers=headers)
-            if response.status_code != 200:
-                print(f"Failed to fetch {file} (Status Code: {response.status_code})")
-                return None
-            cur_soup = BeautifulSoup(response.text, "html.parser")
-            
-            if cur_soup:
-                textarea = cur_soup.find("textarea", {"id": "read-only-cursor-text-area"})
-                if textarea:
-                    main_text.append(textarea.text.strip())
-
-        return Body(url=page_url, 
+        files = await self.github_crawler.crawl(page_url, file_types)
+        main_text = [f"{FILE_MARKER}{path}\n{text.strip()}" for path, text in files if text.strip()]
+
+        body = Body(url=page_url, 
                     title=page_url, 
                     main_text="\n\n".join(main_text), 
                     timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.page_cache.put_extraction(key, asdict(body))
+        return body
 
     async def determine_file_extension(self, prompt: Prompt):
         print("Determining file extensions...")
@@ -258,7 +346,9 @@ class ContentExtractor:
         
         Example output: .py,.md
         """
-        response = await self.client.chat.completions.create(
+        response = await self.llm.chat(
+            "extractor.file_extensions",
+            cache=True,
             model="gpt-4o-mini-2024-07-18",
             messages=[{"role": "system", "content": file_extension_prompt}]
         )
@@ -268,68 +358,151 @@ class ContentExtractor:
         return file_extensions
 
 class Worker:
-    def __init__(self):
-        options = webdriver.ChromeOptions()
-        options.add_argument("--start-maximized")
-        self.driver = webdriver.Chrome(options=options)
-        self.client = AsyncOpenAI()
+    def __init__(self, browser: PooledBrowser, llm: Optional[LLMGateway] = None):
+        self.browser = browser
+        self.driver = browser.driver
+        self.llm = llm or default_llm_gateway()
 
 
-    def current_url(self):
-        return self.driver.current_url
+    async def current_url(self):
+        return await self.browser.run(lambda: self.driver.current_url)
 
-    def page_source(self):
-        return self.driver.page_source
+    async def page_source(self):
+        return await self.browser.run(lambda: self.driver.page_source)
+
+    async def get(self, url: str):
+        await self.browser.run(self.driver.get, url)
+        await self.wait_until_loaded()
+
+    async def perform(self, action: Action):
+        """Run a click, type or scroll action on the browser's executor thread."""
+        await self.browser.run(perform, self.driver, action)
+
+    async def wait_until_loaded(self, timeout: float = 10):
+        try:
+            await self.browser.run(self.browser.wait_until_loaded, timeout)
+        except Exception as e:
+            print(f"Page did not finish loading: {e}")
 
     async def get_action(self, step: ThinkingStep, state: AutomationState, prompt: Prompt) -> ActionStep:
         action_prompt = f"""
-        Convert step into Selenium command. Consider last error to avoid same issue.
-        
+        Choose the next browser action for this step. Consider the last error to avoid the same issue.
+
         Step: {step.next_step}
         Context: {step.context}
         Current URL: {state.current_url}
         Last Error: {state.last_error}
+        Page:
+{state.page_outline}
 
-        Return only the Selenium command, no explanations.
-        Example: driver.get("https://www.google.com")
-
-        Fixes to deprecated commands if they are used:
-        - Use driver.find_element("name", "q") NOT find_element_by_name
-        - Use driver.find_element("id", "search") NOT find_element_by_id
-        - Use driver.find_element("xpath", "//div") NOT find_element_by_xpath
+        Call browser_action with exactly one action, referring to links, inputs and buttons
+        of the page by their [id] in `element`.
         """
 
-        response = await self.client.chat.completions.create(
+        response = await self.llm.chat(
+            "worker.get_action",
             model="gpt-4o-mini-2024-07-18",
-            messages=[{"role": "system", "content": action_prompt}]
+            messages=[{"role": "system", "content": action_prompt}],
+            tools=ACTION_TOOLS,
+            tool_choice={"type": "function", "function": {"name": "browser_action"}},
         )
 
-        command = response.choices[0].message.content.strip()
-        command = "self.worker." + command
-
-        return ActionStep(command)
+        return ActionStep(parse_action(response))
 
 class Scraper:
-    def __init__(self, max_attempts: int = 7):
-        self.state = AutomationState()
+    """Drives a browser (or plain HTTP, where possible) through the pages a scraping task needs.
+
+    Each step either thinks and then asks for an action in two LLM calls
+    (planner="two_call"), or gets both from one call (planner="fused"). The
+    fused planner runs while the page's body is extracted and, with prefetch,
+    starts fetching the page it navigates to next straight away.
+    """
+
+    def __init__(self, max_attempts: int = 7, browser_pool: Optional[BrowserPool] = None, fetcher: Optional[PageFetcher] = None, corpus: Optional[CorpusStore] = None, llm: Optional[LLMGateway] = None,
+                 planner: Optional[PlannerMode] = None, prefetch: bool = True, condenser: Optional[PageCondenser] = None):
+        self.llm = llm or default_llm_gateway()
+        self.planner = planner or os.getenv("BLACKSMITH_SCRAPE_PLANNER", "two_call")
+        self.prefetch = prefetch
+        # url -> static fetch started ahead of navigating there
+        self.prefetched: Dict[str, asyncio.Task] = {}
+        self.state = AutomationState(self.llm)
         self.max_attempts = max_attempts
-        self.thinker = Thinker()
-        self.content_extractor = ContentExtractor()
+        self.browser_pool = browser_pool or default_browser_pool()
+        self.thinker = Thinker(self.llm)
+        self.content_extractor = ContentExtractor(llm=self.llm)
+        self.fetcher = fetcher or PageFetcher(cache=self.content_extractor.page_cache)
         self.worker = None
+        # A page fetched over plain HTTP that the browser hasn't been moved to yet
+        self.static_page: Optional[FetchResult] = None
+        # The page the current step looked at, which actions are validated against
+        self.page: Optional[ParsedPage] = None
+        self.outline: Optional[PageOutline] = None
+        self.condenser = condenser or PageCondenser()
+        # Every body kept so far; on disk for jobs, so it survives restarts and needn't fit in memory
+        self.corpus = corpus or CorpusStore()
+        self.progress: Optional[ProgressChannel] = None
         self.complete = False
 
+    def report(self, page: ParsedPage, body: Optional[Body]):
+        """Publish a progress event for a page we just looked at, if someone is listening."""
+        if self.progress is not None:
+            self.progress.emit("scraping",
+                               url=page.url,
+                               title=body.title if body else None,
+                               pages=len(self.corpus))
+
+    async def navigate(self, url: str):
+        """Go to url over plain HTTP if possible, only driving the browser for pages that need JavaScript."""
+        prefetched = self.prefetched.pop(url, None)
+        self.static_page = await (prefetched or self.fetcher.fetch_static(url))
+        if self.static_page is None:
+            print(f"{url} needs a browser")
+            await self.worker.get(url)
+
+    async def sync_browser(self):
+        """Move the browser to the statically fetched page before interacting with it."""
+        if self.static_page is not None:
+            url, self.static_page = self.static_page.url, None
+            await self.worker.get(url)
+
+    def start_prefetch(self, url: str):
+        """Fetch url in the background so navigating there later doesn't wait for it."""
+        if url not in self.prefetched:
+            metrics.incr("scrape.prefetches")
+            self.prefetched[url] = asyncio.create_task(self.fetcher.fetch_static(url))
+
+    async def extract(self, page: ParsedPage, prompt: Prompt):
+        """Extract and keep the page's body if the page is relevant to the task."""
+        if self.thinker.is_relevant(self.state, prompt):
+            print("Relevant content found, extracting body")
+            if self.static_page is None:
+                self.content_extractor.page_cache.put(page.url, page.page_source)
+            self.state.body_content = await self.content_extractor.extract_body(page, prompt)
+            self.keep_body(self.state.body_content)
+        self.report(page, self.state.body_content)
+
     async def step(self, prompt) -> ThinkingStep | ActionStep:
         print("Updating state")
-        self.state.current_url =  self.worker.current_url()
-        self.state.page_source = self.worker.page_source()
-        self.state.header_content = self.content_extractor.extract_headers(self.state,
-            self.state.current_url, self.state.page_source)
+        if self.static_page is not None:
+            self.state.current_url = self.static_page.url
+            self.state.page_source = self.static_page.html
+        else:
+            self.state.current_url = await self.worker.current_url()
+            self.state.page_source = await self.worker.page_source()
+            self.worker.browser.record_page()
+            self.fetcher.record("browser")
+        page = self.page = ParsedPage(self.state.current_url, self.state.page_source)
+        # Parsing and condensing walk the whole page, so they run off the event loop
+        self.outline = await asyncio.to_thread(self.condenser.condense, page)
+        self.state.header_content = self.content_extractor.extract_headers(self.state, page)
+        self.state.page_outline = self.outline.render()
+        self.state.page_summary = self.outline.render(elements=False)
 
         print("Header content:", self.state.header_content)
-        if self.thinker.is_relevant(self.state, prompt):
-            print("Relevant content found, extracting body")
-            self.state.body_content = await self.content_extractor.extract_body(self.state.current_url, 
-                self.state.page_source, prompt)
+        if self.planner == "fused":
+            return await self.fused_step(page, prompt)
+
+        await self.extract(page, prompt)
         thinking_step: ThinkingStep = await self.thinker.think(self.state, prompt)
         if thinking_step.next_step == "DONE":
             return thinking_step
@@ -338,38 +511,168 @@ class Scraper:
             action_step: ActionStep = await self.worker.get_action(thinking_step, self.state, prompt)
             return action_step
 
+    async def fused_step(self, page: ParsedPage, prompt: Prompt) -> ThinkingStep | ActionStep:
+        """Plan the next step in one call while the page's body is extracted."""
+        extraction = asyncio.create_task(self.extract(page, prompt))
+        try:
+            thinking_step, action = await self.thinker.plan(self.state, prompt)
+            if action is not None:
+                action = validate(action, page, self.outline)
+                if self.prefetch and action.kind in ("navigate", "follow_link"):
+                    self.start_prefetch(action.url)
+        finally:
+            await extraction
+        if action is None:
+            return thinking_step
+        print("Thinking step:", thinking_step)
+        return ActionStep(action)
+
     async def scrape_content(self, prompt: Prompt):
-        self.worker = Worker()
+        self.worker = Worker(await self.browser_pool.acquire(), self.llm)
         print("Starting scraping process")
         attempt = 0
-        self.worker.driver.get("https://www.google.com")
-        time.sleep(1)
+        await self.worker.get("https://www.google.com")
 
         while attempt < self.max_attempts:
             print(f"Attempt {attempt + 1}")
-            step = await self.step(prompt)
+            try:
+                step = await self.step(prompt)
+            except ActionError as e:
+                self.action_failed("invalid", e)
+                attempt += 1
+                continue
             if isinstance(step, ThinkingStep):
                 print("Thinking step:", step.next_step)
-                return
+                break
             elif isinstance(step, ActionStep):
                 print("Action step:", step.action)
                 try:
-                    exec(step.action)
+                    await self.run_action(step.action, prompt)
+                except ActionError as e:
+                    self.action_failed("invalid", e)
                 except Exception as e:
-                    print(e)
-                    self.state.last_error = str(e)
-                time.sleep(1)
+                    self.action_failed("failed", e)
             attempt += 1
 
         if attempt >= self.max_attempts:
             print("Maximum attempts reached without completing task")
 
+        print("Pages fetched by path:", self.fetcher.path_fractions())
         self.complete = True
-        self.close()
+        await self.close()
+
+    async def run_action(self, action: Action, prompt: Prompt):
+        """Check action against the current page, then carry it out.
 
-    def close(self):
+        Navigation goes through the static fetch path like any other page load;
+        only clicks, typing and scrolling need the browser.
+        """
+        action = validate(action, self.page, self.outline)
+        metrics.incr(f"scrape.actions.{action.kind}")
+        if action.kind in ("navigate", "follow_link"):
+            await self.navigate(action.url)
+        elif action.kind == "extract":
+            self.keep_body(await self.content_extractor.extract_body(self.page, prompt))
+        else:
+            await self.sync_browser()
+            await self.worker.perform(action)
+            await self.worker.wait_until_loaded()
+
+    def action_failed(self, reason: str, error: Exception):
+        """Count a step whose action was rejected or failed, and show the model why on the next one."""
+        print(f"Action {reason}: {error}")
+        metrics.incr(f"scrape.action_errors.{reason}")
+        self.state.last_error = str(error)
+
+    def keep_body(self, body: Optional[Body]) -> bool:
+        """Add an extracted body to this scrape's corpus, ignoring empty or repeated pages."""
+        if body is None:
+            return False
+        return self.corpus.append(body.url, body.title, body.main_text, body.timestamp)
+
+    def corpus_text(self) -> str:
+        """All text extracted so far, one page after another."""
+        return self.corpus.text()
+
+    async def close(self):
+        prefetched, self.prefetched = list(self.prefetched.values()), {}
+        for task in prefetched:
+            task.cancel()
+        await asyncio.gather(*prefetched, return_exceptions=True)
         if self.worker:
-            self.worker.driver.quit()
+            worker, self.worker = self.worker, None
+            await self.browser_pool.release(worker.browser)
+
+    async def visit(self, url: str, worker: Optional[Worker]) -> tuple[ParsedPage, Optional[Worker]]:
+        """Load url for a frontier branch, leasing a browser only if the page needs one."""
+        static_page = await self.fetcher.fetch_static(url)
+        if static_page is not None:
+            return ParsedPage(url, static_page.html), worker
+
+        if worker is None:
+            worker = Worker(await self.browser_pool.acquire(), self.llm)
+        await worker.get(url)
+        worker.browser.record_page()
+        self.fetcher.record("browser")
+        page_source = await worker.page_source()
+        self.content_extractor.page_cache.put(url, page_source)
+        return ParsedPage(await worker.current_url(), page_source), worker
+
+    async def explore(self, frontier: Frontier, prompt: Prompt, links_per_page: int):
+        """One branch of a frontier scrape: keep taking candidates until the budget runs out."""
+        worker = None
+        try:
+            while True:
+                candidate = await frontier.next()
+                if candidate is None:
+                    continue
+                try:
+                    print(f"Exploring {candidate.url} (depth {candidate.depth})")
+                    page, worker = await self.visit(candidate.url, worker)
+                    await page.parse()
+                    self.state.header_content = self.content_extractor.extract_headers(self.state, page)
+                    body = await self.content_extractor.extract_body(page, prompt)
+                    if self.keep_body(body):
+                        self.state.body_content = body
+                    self.report(page, body)
+                    if not frontier.exhausted() and candidate.depth < frontier.max_depth:
+                        for url in await self.thinker.propose_links(prompt, page, max_links=links_per_page):
+                            frontier.push(url, candidate.depth + 1)
+                except Exception as e:
+                    print(f"Failed to explore {candidate.url}: {e}")
+                    self.state.last_error = str(e)
+                finally:
+                    frontier.done()
+        finally:
+            if worker is not None:
+                await self.browser_pool.release(worker.browser)
+
+    async def scrape_frontier(self, prompt: Prompt,
+                              start_urls: Optional[List[str]] = None,
+                              branches: int = 4,
+                              links_per_page: int = 4,
+                              max_pages: int = 20,
+                              time_budget: float = 120,
+                              max_depth: int = 3):
+        """Explore several candidate pages concurrently and merge everything extracted into one corpus."""
+        print("Starting frontier scraping process")
+        frontier = Frontier(max_pages=max_pages, time_budget=time_budget, max_depth=max_depth)
+        for url in start_urls or await self.thinker.propose_links(prompt, max_links=branches):
+            frontier.push(url, 0)
+
+        explorers = [asyncio.create_task(self.explore(frontier, prompt, links_per_page)) for _ in range(branches)]
+        try:
+            await asyncio.wait_for(frontier.queue.join(), timeout=frontier.remaining_time())
+        except asyncio.TimeoutError:
+            print("Scraping time budget reached")
+        finally:
+            for explorer in explorers:
+                explorer.cancel()
+            await asyncio.gather(*explorers, return_exceptions=True)
+
+        print(f"Visited {frontier.visited} pages, corpus has {len(self.corpus)} pages")
+        print("Pages fetched by path:", self.fetcher.path_fractions())
+        self.complete = True
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
+"""A standalone agent loop driving a Chrome window; it uses relative imports, so run it as a module:
+
+    python -m blacksmith.scrape.scraping2
+"""
+from .actions import ACTION_TOOLS, ActionError, parse_action, perform, validate
+from .condense import PageCondenser
+from .document import ParsedPage
+
 from openai import OpenAI
 
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 import time
 
 # Set up Selenium WebDriver
@@ -14,43 +20,32 @@ driver = webdriver.Chrome(options=options)
 OPENAI_API_KEY = ""
 
 client = OpenAI(organization="", api_key=OPENAI_API_KEY)
+condenser = PageCondenser()
 
 
-
-def clean_selenium_command(command):
-    # Remove code block markers and whitespace
-    cleaned = command.strip()
-    cleaned = cleaned.removeprefix('```')
-    cleaned = cleaned.removesuffix('\n```')
-    return cleaned.strip()
-
 # Function to get action from LLM
-def get_llm_action(user_input, page_source):
+def get_llm_action(user_input, outline):
     prompt = f"""
     You are an automation assistant controlling a web browser via Selenium.
-    The user provides commands, and you generate Python Selenium actions.
+    The user provides commands, and you turn each one into a browser action.
     
-    Current page source:
-    {page_source[:5000]}  # Limit characters to avoid overload
+    Current page:
+{outline}
 
     User input: "{user_input}"
 
-    Respond with the Python Selenium command only, without explanation. DO NOT prefix with python.
+    Call browser_action with the action that carries out the command, referring to
+    links, inputs and buttons of the page by their [id] in `element`.
     """
 
     response = client.chat.completions.create(
         model="gpt-4o-mini-2024-07-18",
         messages=[{"role": "system", "content": prompt}],
-        # api_key=OPENAI_API_KEY,
+        tools=ACTION_TOOLS,
+        tool_choice={"type": "function", "function": {"name": "browser_action"}},
     )
 
-    # return response["choices"][0]["message"]["content"]
-    print(response.choices[0].message.content)
-    print(response)
-    # return response.choices[0].message.content
-    response_string = response.choices[0].message.content
-    cleaned_command = clean_selenium_command(response_string)
-    return cleaned_command    
+    return parse_action(response)
 
 # Interactive loop
 try:
@@ -63,12 +58,21 @@ try:
             break
 
         page_source = driver.page_source  # Get current page HTML
-        selenium_command = get_llm_action(user_command, page_source)
 
         try:
-            print(selenium_command)
-
-            exec(selenium_command)  # Execute the generated Selenium command
+            page = ParsedPage(driver.current_url, page_source)
+            outline = condenser.condense(page)
+            action = validate(get_llm_action(user_command, outline.render()), page, outline)
+            print(action)
+
+            if action.kind in ("navigate", "follow_link"):
+                driver.get(action.url)
+            elif action.kind == "extract":
+                print("\n".join(page.headers()))
+            else:
+                perform(driver, action)
+        except ActionError as e:
+            print(f"Invalid action: {e}")
         except Exception as e:
             print(f"Error executing command: {e}")
 
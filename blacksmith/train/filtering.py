@@ -0,0 +1,171 @@
+from ..metrics import metrics
+from .jsonl import JsonLData, PromptData
+
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Multiplier for combining word hashes into shingle hashes (64-bit FNV prime)
+SHINGLE_MULTIPLIER = np.uint64(0x100000001B3)
+
+@dataclass
+class FilterReport:
+    total: int = 0
+    kept: int = 0
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+    def drop(self, reason: str):
+        self.dropped[reason] = self.dropped.get(reason, 0) + 1
+
+    def __str__(self):
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.dropped.items()) or "none"
+        return f"Kept {self.kept}/{self.total} Q/A pairs (dropped {reasons})"
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+class QAFilter:
+    """Drops empty, badly sized and duplicate Q/A pairs before they are uploaded.
+
+    Records are checked in order and the first of a group of duplicates is the
+    one kept. Exact duplicates are caught by hashing the normalized user and
+    assistant text. Near duplicates are found with MinHash over word shingles:
+    signatures are bucketed by LSH bands and a record is dropped when a
+    previously kept record in one of its buckets has an estimated Jaccard
+    similarity of at least `threshold`. Both passes stream over the data; only
+    the signatures of kept records are held in memory.
+    """
+
+    def __init__(self, min_chars: int = 8, max_chars: int = 8000, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # Multiply-shift hash functions (a * x + b) >> 32 with odd 64-bit a, one per permutation
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)[:, None] * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)[:, None]
+
+    def rejection(self, record: PromptData) -> Optional[str]:
+        """The reason record fails the field checks, or None if it passes."""
+        if not all(text.strip() for text in (record.system_prompt, record.user_prompt, record.assistant_prompt)):
+            return "empty"
+        if len(record.user_prompt.strip()) < self.min_chars or len(record.assistant_prompt.strip()) < self.min_chars:
+            return "too_short"
+        if len(record.system_prompt) + len(record.user_prompt) + len(record.assistant_prompt) > self.max_chars:
+            return "too_long"
+        return None
+
+    def _word_hashes(self, words: List[str], cache: Dict[str, int]) -> List[int]:
+        hashes = list(map(cache.get, words))
+        if None in hashes:
+            for i, word in enumerate(words):
+                if hashes[i] is None:
+                    hashes[i] = cache[word] = zlib.crc32(word.encode())
+        return hashes or [0]
+
+    def signatures(self, texts: List[List[str]], cache: Optional[Dict[str, int]] = None) -> np.ndarray:
+        """MinHash signatures (one row per text) of the shingles of texts, given as word lists.
+
+        Only the per-word hashing is done in Python; shingle hashes, the
+        permutations and the per-text minimums are computed for the whole batch
+        at once. Texts shorter than a shingle become a single shingle.
+        """
+        cache = {} if cache is None else cache
+        per_text = [self._word_hashes(words, cache) for words in texts]
+        lengths = np.fromiter((len(h) for h in per_text), dtype=np.int64, count=len(per_text))
+        words = np.fromiter((h for hashes in per_text for h in hashes), dtype=np.uint64, count=int(lengths.sum()))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        # Words left until the end of the text, for every word position
+        remaining = np.repeat(starts + lengths, lengths) - np.arange(len(words))
+
+        # prefixes[j] hashes the j + 1 words starting at each position (uint64 arithmetic wraps)
+        prefixes = [words]
+        for j in range(1, self.shingle_size):
+            shifted = np.concatenate((words[j:], np.zeros(j, dtype=np.uint64)))
+            prefixes.append(prefixes[-1] * SHINGLE_MULTIPLIER ^ shifted)
+        short_start = np.zeros(len(words), dtype=bool)
+        short_start[starts] = lengths < self.shingle_size
+        shingles = prefixes[-1].copy()
+        for j in range(self.shingle_size - 1):
+            short = short_start & (remaining == j + 1)
+            shingles[short] = prefixes[j][short]
+        valid = (remaining >= self.shingle_size) | short_start
+        shingles = shingles[valid]
+        shingles = (shingles >> np.uint64(32)) ^ (shingles & np.uint64(0xFFFFFFFF))
+
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        # Permutations along the rows so the per-text minimum runs over contiguous memory
+        permuted = np.outer(self.a, shingles)
+        permuted += self.b
+        permuted >>= np.uint64(32)
+        return np.minimum.reduceat(permuted.astype(np.uint32), offsets, axis=1).T
+
+    def filter(self, data: JsonLData, batch_size: int = 1024) -> Tuple[JsonLData, FilterReport]:
+        """Return a new JsonLData with the surviving records, and what was dropped."""
+        report = FilterReport()
+        keep: List[bool] = []
+        seen_hashes = set()
+        # LSH band key -> 1 + index of the first kept signature in that bucket
+        buckets: Dict[int, int] = {}
+        kept_signatures: List[np.ndarray] = []
+        word_cache: Dict[str, int] = {}
+        # Records that passed the cheap checks and still need the near-duplicate check
+        batch: List[Tuple[int, List[str]]] = []
+        band_weights = np.random.default_rng(seed=0).integers(1, 1 << 32, self.rows, dtype=np.uint64)
+        # Mixed into the band hashes so every band gets its own buckets within one dict
+        band_salts = np.arange(self.bands, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+        def flush():
+            signatures = self.signatures([words for _, words in batch], word_cache)
+            # One hash per LSH band; uint64 overflow just wraps, which is fine for bucketing
+            band_keys = (signatures.reshape(len(batch), self.bands, self.rows).astype(np.uint64) * band_weights).sum(axis=2) ^ band_salts
+            for (index, _), signature, keys in zip(batch, signatures, band_keys.tolist()):
+                candidates = set(filter(None, map(buckets.get, keys)))
+                if any(np.count_nonzero(kept_signatures[c - 1] == signature) >= self.threshold * self.num_perm for c in candidates):
+                    keep[index] = False
+                    report.drop("near_duplicate")
+                    metrics.incr("qa.filtered.near_duplicate")
+                    continue
+                kept_signatures.append(signature)
+                for key in keys:
+                    buckets.setdefault(key, len(kept_signatures))
+            batch.clear()
+
+        for record in data:
+            report.total += 1
+            reason = self.rejection(record)
+            if reason is None:
+                words = _words(record.user_prompt + "\n" + record.assistant_prompt)
+                digest = hashlib.sha1(" ".join(words).encode()).digest()
+                if digest in seen_hashes:
+                    reason = "exact_duplicate"
+                seen_hashes.add(digest)
+            if reason is not None:
+                report.drop(reason)
+                metrics.incr(f"qa.filtered.{reason}")
+                keep.append(False)
+                continue
+            keep.append(True)
+            batch.append((len(keep) - 1, words))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        filtered = JsonLData()
+        for record, kept in zip(data, keep):
+            if kept:
+                filtered.add_prompt(record.system_prompt, record.user_prompt, record.assistant_prompt)
+        report.kept = len(filtered)
+        return filtered, report
@@ -1,11 +1,10 @@
 import time
-from enum import Enum
 import os
-from io import BytesIO
+import json
 import asyncio
 
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Iterable, Optional, List
 
 from openai import AsyncOpenAI
 from openai.types import FileObject
@@ -13,31 +12,14 @@ from openai.types.fine_tuning import FineTuningJob
 
 from mistralai import Mistral
 
-@dataclass
-class PromptData:
-    system_prompt: str
-    user_prompt: str
-    assistant_prompt: str
-
-    def __str__(self):
-        return f'''\
-{{"messages": [{{"role": "system", "content": "{self.system_prompt}" }},\
-{{"role": "user", "content": "{self.user_prompt}"}},\
-{{"role": "assistant", "content": "{self.assistant_prompt}"}}]}}\
-'''
-
-class JsonLData:
-    def __init__(self):
-        self.prompts: List[PromptData] = []
-
-    def add_prompt(self, system_prompt: str, user_prompt: str, assistant_prompt: str):
-        self.prompts.append(PromptData(system_prompt, user_prompt, assistant_prompt))
-
-    def __str__(self):
-        return "\n".join([str(prompt) for prompt in self.prompts])
-
-    def __len__(self):
-        return len(self.prompts)
+from ..deploy.router import Deployment, InferenceRouter, default_inference_router
+from ..llm import LLMGateway, default_llm_gateway
+from ..metrics import metrics
+from ..progress import ProgressChannel
+from ..scrape.chunking import chunk_text
+from .filtering import QAFilter
+from .jsonl import JsonLData
+from .monitor import FinetuneMonitor, JobSnapshot, Status, default_finetune_monitor
 
 class JsonLGenerator:
     QA_PROMPT = \
@@ -117,13 +99,58 @@ Here are the prompts and data:
         }
     ]
 
-    def __init__(self):
+    def __init__(self, chunk_tokens: int = 3000, concurrency: int = 4, llm: Optional[LLMGateway] = None):
         self.data = JsonLData()
-        self.client = AsyncOpenAI()
+        self.llm = llm or default_llm_gateway()
+        self.chunk_tokens = chunk_tokens
+        self.concurrency = concurrency
 
     async def generate_from_text(self, model_query: str, data_query: str, data: str):
+        """Generate Q/A pairs from data, split into prompt-sized chunks processed concurrently."""
+        await self.generate_from_chunks(model_query, data_query, chunk_text(str(data), self.chunk_tokens) or [""])
+
+    async def generate_from_chunks(self, model_query: str, data_query: str, chunks: Iterable[str]):
+        """Generate Q/A pairs from chunks of at most chunk_tokens, pulling them lazily.
+
+        `concurrency` workers share one iterator, so a corpus streamed from disk
+        is never held in memory all at once.
+        """
+        chunks = iter(chunks)
+        start = time.perf_counter()
+        pairs = 0
+        chunk_count = 0
+
+        async def worker():
+            nonlocal pairs, chunk_count
+            for chunk in chunks:
+                chunk_count += 1
+                try:
+                    result = await self.generate_from_chunk(model_query, data_query, chunk)
+                except Exception as e:
+                    print(f"Q/A generation failed for a chunk: {e}")
+                    continue
+                # Write each chunk's pairs out as soon as it finishes rather than holding them all
+                for kwargs in result:
+                    self.data.add_prompt(
+                        kwargs["system_prompt"],
+                        kwargs["user_prompt"],
+                        kwargs["assistant_prompt"],
+                    )
+                    pairs += 1
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        elapsed = time.perf_counter() - start
+        pairs_per_minute = pairs / elapsed * 60 if elapsed > 0 else 0.0
+        metrics.incr("qa.pairs", pairs)
+        metrics.observe("qa.pairs_per_minute", pairs_per_minute)
+        print(f"Generated {pairs} Q/A pairs from {chunk_count} chunks in {elapsed:.1f}s ({pairs_per_minute:.1f} pairs/minute)")
+
+    async def generate_from_chunk(self, model_query: str, data_query: str, data: str) -> List[dict]:
+        """Make one Q/A generation call; the gateway paces and retries it."""
         prompt = f"{self.QA_PROMPT}\nModel Query: \"{model_query}\"\nData Query: \"{data_query}\"\nData: \"{data}\"\n"
-        response = await self.client.chat.completions.create(
+        response = await self.llm.chat(
+            "qa.generate",
             model="gpt-4o-mini",
             messages=[
                 {"role": "user", "content": prompt},
@@ -131,15 +158,34 @@ Here are the prompts and data:
             tools=self.QA_TOOLS,
         )
 
-        tool_calls = response.choices[0].message.tool_calls
-        for tool_call in tool_calls:
+        pairs = []
+        for tool_call in response.choices[0].message.tool_calls or []:
             if tool_call.function.name == "generate_question_answer":
-                kwargs = eval(tool_call.function.arguments)
-                self.data.add_prompt(
-                    kwargs["system_prompt"],
-                    kwargs["user_prompt"],
-                    kwargs["assistant_prompt"],
-                )
+                try:
+                    kwargs = json.loads(tool_call.function.arguments)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping malformed Q/A pair: {e}")
+                    continue
+                if all(key in kwargs for key in ("system_prompt", "user_prompt", "assistant_prompt")):
+                    pairs.append(kwargs)
+        return pairs
+
+_default_openai_client: Optional[AsyncOpenAI] = None
+_default_mistral_client: Optional[Mistral] = None
+
+def default_openai_client() -> AsyncOpenAI:
+    """The process-wide OpenAI client for files and fine-tuning jobs, so the monitor can poll every job in one listing."""
+    global _default_openai_client
+    if _default_openai_client is None:
+        _default_openai_client = AsyncOpenAI()
+    return _default_openai_client
+
+def default_mistral_client() -> Mistral:
+    """The process-wide Mistral client for files and fine-tuning jobs."""
+    global _default_mistral_client
+    if _default_mistral_client is None:
+        _default_mistral_client = Mistral(os.getenv("MISTRAL_API_KEY"))
+    return _default_mistral_client
 
 @dataclass
 class MistralModel:
@@ -147,22 +193,22 @@ class MistralModel:
     ft_id: Optional[str] = None
     ft_name: Optional[str] = None
 
-    def __init__(self):
-        self.client = Mistral(os.getenv("MISTRAL_API_KEY"))
+    def __init__(self, client: Optional[Mistral] = None):
+        self.client = client or default_mistral_client()
         self.name = "open-mistral-7b"
 
-    async def create_file(self, data_str: str) -> FileObject:
-        """Create a file with the given data."""
+    async def create_file(self, data: JsonLData) -> FileObject:
+        """Create a file with the given data, streamed from a copy on disk."""
 
-        file = BytesIO(data_str.encode()).read()
-
-        return await self.client.files.upload_async(
-            file={
-                "file_name": "data.jsonl",
-                "content": file,
-            },
-            purpose="fine-tune",
-        )
+        # The SDK only accepts bytes or a real file, not the spooled file behind JsonLData
+        with data.disk_file() as file:
+            return await self.client.files.upload_async(
+                file={
+                    "file_name": "data.jsonl",
+                    "content": file,
+                },
+                purpose="fine-tune",
+            )
 
     async def list_files(self) -> str:
         """List all files."""
@@ -187,17 +233,15 @@ class GptModel:
     ft_id: Optional[str] = None
     ft_name: Optional[str] = None
 
-    def __init__(self):
-        self.client = AsyncOpenAI()
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = client or default_openai_client()
         self.name = "gpt-3.5-turbo-0125"
 
-    async def create_file(self, data_str: str) -> FileObject:
-        """Create a file with the given data."""
-
-        file = BytesIO(data_str.encode())
+    async def create_file(self, data: JsonLData) -> FileObject:
+        """Create a file with the given data, streamed from its spool file."""
 
         return await self.client.files.create(
-            file=file,
+            file=("data.jsonl", data.upload_file(), "application/jsonl"),
             purpose="fine-tune",
         )
 
@@ -222,30 +266,36 @@ class GptModel:
         for file in self.list_files():
             self.delete_file(file.id)
 
-class Status(Enum):
-    PENDING = "pending"
-    SUCCEEDED = "succeeded"
-    FAILED = "failed"
-
 @dataclass
 class SmithModel:
     model: GptModel | MistralModel
     system_prompt: Optional[str] = None
     jsonl_generator: Optional[JsonLGenerator] = None
-    client: AsyncOpenAI = AsyncOpenAI()
 
-    def __init__(self, model: str):
+    def __init__(self, model: str, monitor: Optional[FinetuneMonitor] = None, llm: Optional[LLMGateway] = None,
+                 router: Optional[InferenceRouter] = None):
         if model == "gpt":
             self.model = GptModel()
         elif model == "mistral":
             self.model = MistralModel()
-        self.jsonl_generator = JsonLGenerator()
+        self.llm = llm or default_llm_gateway()
+        self.jsonl_generator = JsonLGenerator(llm=self.llm)
+        self.qa_filter = QAFilter()
+        self.monitor = monitor or default_finetune_monitor()
+        self.router = router or default_inference_router()
         self.complete = False
+        self.progress: Optional[ProgressChannel] = None
+
+    def report(self, stage: str, summary: Optional[str] = None, **detail):
+        """Publish a progress event if someone is listening."""
+        if self.progress is not None:
+            self.progress.emit(stage, summary=summary, **detail)
 
-    async def summarize(self):
+    async def summarize(self, status: Optional[Status] = None):
         """Summarize the current state of the model."""
 
-        status = await self.get_finetune_status()
+        if status is None:
+            status = await self.get_finetune_status()
         if status is None:
             return "Preparing to finetune model..."
 
@@ -270,37 +320,61 @@ class SmithModel:
             
         prompt_info = f"""
 type of model: {self.model.name}
-status: {(await self.get_finetune_status()).name}
+status: {status.name}
 """
 
-        summary = await self.client.chat.completions.create(
+        summary = await self.llm.chat(
+            "model.summarize",
+            cache=True,
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt + prompt_info}]
         )
         summary = summary.choices[0].message.content.strip()
         return summary
 
-    async def finetune_text_model(self, model_query: str, data_query: str, data: str, interactive: bool = False):
-        """Finetune a text model with the given data."""
+    async def finetune_text_model(self, model_query: str, data_query: str, data: str | Iterable[str], interactive: bool = False):
+        """Finetune a text model with the given data, either one string or an iterable of prompt-sized chunks."""
         print("Fine-tuning model...\n")
 
-        print("Generating prompts...\n")
-        await self.jsonl_generator.generate_from_text(
-            model_query=model_query,
-            data_query=data_query,
-            data=data,
-        )
-        
-        data: JsonLData = self.jsonl_generator.data
+        dataset = await self.generate_dataset(model_query, data_query, data)
+        if len(dataset) == 0:
+            return
 
-        if len(data) == 0:
+        await self.start_finetune(dataset)
+        await self.wait_for_finetune()
+        if not self.complete:
             return
 
+        print("Fine-tuning succeeded.\n")
+        if interactive:
+            while True:
+                user_prompt = input("Enter a prompt: ")
+                print(await self.prompt(user_prompt))
+
+    async def generate_dataset(self, model_query: str, data_query: str, data: str | Iterable[str]) -> JsonLData:
+        """Generate Q/A pairs from data and filter them down to the training set."""
+        print("Generating prompts...\n")
+        self.report("finetuning", summary="Generating question/answer pairs from the scraped data...")
+        if isinstance(data, str):
+            await self.jsonl_generator.generate_from_text(model_query, data_query, data)
+        else:
+            await self.jsonl_generator.generate_from_chunks(model_query, data_query, data)
+
+        # Filtering is CPU-bound on large datasets, so keep it off the event loop
+        dataset, filter_report = await asyncio.to_thread(self.qa_filter.filter, self.jsonl_generator.data)
+        print(filter_report)
+        self.report("finetuning", summary=f"{filter_report}...", kept=filter_report.kept, dropped=filter_report.dropped)
+        return dataset
+
+    async def start_finetune(self, data: JsonLData) -> str:
+        """Upload data and start a fine-tuning job on it, returning the job id."""
+        self.report("finetuning", summary=f"Uploading {len(data)} training examples...", examples=len(data))
+
         if isinstance(self.model, GptModel):
-            self.system_prompt = data.prompts[0].system_prompt
+            self.system_prompt = data.system_prompt
             print("System prompt:", self.system_prompt)
             print("Creating GPT files...")
-            file = await self.model.create_file(str(data))
+            file = await self.model.create_file(data)
 
             print("Fine-tuning model...")
             ft_job: FineTuningJob = await self.model.client.fine_tuning.jobs.create(
@@ -312,10 +386,10 @@ status: {(await self.get_finetune_status()).name}
             )
             self.model.ft_id = ft_job.id
         elif isinstance(self.model, MistralModel):
-            self.system_prompt = data.prompts[0].system_prompt
+            self.system_prompt = data.system_prompt
             print("System prompt:", self.system_prompt)
             print("Creating Mistral files...")
-            file = await self.model.create_file(str(data))
+            file = await self.model.create_file(data)
 
             print("Fine-tuning model...")
             ft_job = await self.model.client.fine_tuning.jobs.create_async(
@@ -327,89 +401,50 @@ status: {(await self.get_finetune_status()).name}
             )
 
             self.model.ft_id = ft_job.id
-
-        while True:
-            ft_status = await self.get_finetune_status()
-            ft_name = await self.get_finetune_name()
-            print(await self.summarize())
-            if ft_status == Status.SUCCEEDED:
-                self.complete = True
-                self.model.ft_name = ft_name
-                print(self.model.ft_name)
-                break
-            elif ft_status == Status.FAILED:
-                self.complete = False
-                print("Fine-tuning failed.")
-                return
-            await asyncio.sleep(5)
-        
-        print("Fine-tuning succeeded.\n")
-        if interactive:
-            while True:
-                user_prompt = input("Enter a prompt: ")
-                print(await self.prompt(user_prompt))
+        return self.model.ft_id
+
+    async def wait_for_finetune(self):
+        """Wait for the fine-tuning job in model.ft_id to finish; sets complete and ft_name."""
+        def on_change(snapshot: JobSnapshot):
+            print("Fine-tuning status:", snapshot.raw_status)
+            self.report("finetuning", status=snapshot.status.value, raw_status=snapshot.raw_status, ft_id=self.model.ft_id)
+
+        snapshot = await self.monitor.wait(self.model.client, self.model.ft_id, on_change)
+        if snapshot.status == Status.FAILED:
+            self.complete = False
+            print("Fine-tuning failed.")
+            return
+        self.complete = True
+        self.model.ft_name = snapshot.ft_name
+        print(self.model.ft_name)
 
     async def get_finetune_status(self) -> Optional[Status]:
         """Get the status of the current fine-tuning job."""
-        if isinstance(self.model, GptModel):
-            if self.model.ft_id is None:
-                return None
-            ft_job: FineTuningJob = await self.model.client.fine_tuning.jobs.retrieve(self.model.ft_id)
-            if ft_job is None:
-                return None
-            elif ft_job.status == "succeeded":
-                return Status.SUCCEEDED
-            elif ft_job.status == "failed":
-                return Status.FAILED
-            else:
-                return Status.PENDING
-        elif isinstance(self.model, MistralModel):
-            if self.model.ft_id is None:
-                return None
-            ft_job = await self.model.client.fine_tuning.jobs.get_async(job_id=self.model.ft_id)
-            if ft_job is None:
-                return None
-            elif ft_job.status == "SUCCESS":
-                return Status.SUCCEEDED
-            elif ft_job.status == "FAILED" or ft_job.status == "FAILED_VALIDATION":
-                return Status.FAILED
-            else:
-                return Status.PENDING
+        if self.model.ft_id is None:
+            return None
+        snapshot = await self.monitor.fetch(self.model.client, self.model.ft_id)
+        return snapshot.status
 
     async def get_finetune_name(self) -> Optional[str]:
         """Get the name of the fine-tuned model."""
         if self.model.ft_id is None:
             return None
+        snapshot = await self.monitor.fetch(self.model.client, self.model.ft_id)
+        return snapshot.ft_name
 
-        if isinstance(self.model, GptModel):
-            ft_job: FineTuningJob = await self.model.client.fine_tuning.jobs.retrieve(self.model.ft_id)
-        elif isinstance(self.model, MistralModel):
-            ft_job = await self.model.client.fine_tuning.jobs.get_async(job_id=self.model.ft_id)
-        return ft_job.fine_tuned_model
+    def deployment(self) -> Optional[Deployment]:
+        """The fine-tuned model to serve, once fine-tuning has finished."""
+        if self.model.ft_name is None or self.system_prompt is None:
+            return None
+        provider = "gpt" if isinstance(self.model, GptModel) else "mistral"
+        return Deployment(provider, self.model.ft_name, self.system_prompt)
 
     async def prompt(self, prompt: str) -> str:
         """Generate a response to the given prompt."""
-
-        if self.model.ft_name is None or self.system_prompt is None:
+        deployment = self.deployment()
+        if deployment is None:
             return "Model not finetuned yet."
-
-        if isinstance(self.model, GptModel):
-            return await self.model.client.chat.completions.create(
-                model=self.model.ft_name,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.1,
-            ).choices[0].message.content
-        elif isinstance(self.model, MistralModel):
-            return await self.model.client.chat.complete_async(
-                model=self.model.ft_name,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt},
-                ],
-            )
+        return await self.router.complete(deployment, prompt, temperature=0.1)
     
 
 if __name__ == "__main__":
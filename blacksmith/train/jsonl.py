@@ -0,0 +1,113 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import IO, BinaryIO, Iterator, Optional
+
+@dataclass
+class PromptData:
+    system_prompt: str
+    user_prompt: str
+    assistant_prompt: str
+
+    def to_dict(self) -> dict:
+        return {
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.user_prompt},
+                {"role": "assistant", "content": self.assistant_prompt},
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "PromptData":
+        contents = {message["role"]: message["content"] for message in record["messages"]}
+        return cls(contents["system"], contents["user"], contents["assistant"])
+
+    def __str__(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+class JsonLData:
+    """Training examples written out as JSONL the moment they are added.
+
+    Records live in a spooled temporary file: small datasets stay in memory,
+    anything past `spill_bytes` moves to disk, and uploads stream from the file
+    object instead of building the dataset as one string.
+    """
+
+    def __init__(self, spill_bytes: int = 8 * 1024 * 1024):
+        self.file = tempfile.SpooledTemporaryFile(max_size=spill_bytes, mode="w+b", suffix=".jsonl")
+        self.count = 0
+        self.size = 0
+        self.system_prompt: Optional[str] = None
+
+    def add_prompt(self, system_prompt: str, user_prompt: str, assistant_prompt: str):
+        line = (str(PromptData(system_prompt, user_prompt, assistant_prompt)) + "\n").encode()
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(line)
+        self.count += 1
+        self.size += len(line)
+        if self.system_prompt is None:
+            self.system_prompt = system_prompt
+
+    def __iter__(self) -> Iterator[PromptData]:
+        position = 0
+        while True:
+            # Another reader or writer may have moved the file since the last record
+            self.file.seek(position)
+            line = self.file.readline()
+            if not line:
+                return
+            position = self.file.tell()
+            yield PromptData.from_dict(json.loads(line))
+
+    def upload_file(self) -> IO[bytes]:
+        """Rewind and return the underlying file so it can be streamed as an upload."""
+        self.file.flush()
+        self.file.seek(0)
+        return self.file
+
+    @contextlib.contextmanager
+    def disk_file(self) -> Iterator[BinaryIO]:
+        """The records as a real file opened for reading, for SDKs that won't take a spooled file (Mistral's)."""
+        with tempfile.TemporaryDirectory(prefix="blacksmith-upload-") as directory:
+            path = os.path.join(directory, "data.jsonl")
+            self.save(path)
+            with open(path, "rb") as f:
+                yield f
+
+    def save(self, path: str):
+        """Copy the records to path, e.g. to checkpoint a dataset between pipeline stages."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file.flush()
+        self.file.seek(0)
+        with open(path + ".tmp", "wb") as f:
+            shutil.copyfileobj(self.file, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "JsonLData":
+        """Read back a dataset written by `save`."""
+        data = cls()
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if data.system_prompt is None:
+                    data.system_prompt = PromptData.from_dict(json.loads(line)).system_prompt
+                data.file.write(line)
+                data.count += 1
+                data.size += len(line)
+        return data
+
+    def close(self):
+        self.file.close()
+
+    def __str__(self):
+        self.file.seek(0)
+        return self.file.read().decode().rstrip("\n")
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,245 @@
+from ..metrics import metrics
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+from mistralai import Mistral
+
+class Status(Enum):
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+SUCCEEDED_STATUSES = {"succeeded", "SUCCESS"}
+FAILED_STATUSES = {"failed", "cancelled", "FAILED", "FAILED_VALIDATION", "CANCELLED"}
+
+def to_status(raw_status: str) -> Status:
+    """Map a GPT or Mistral job status onto the pipeline's three states."""
+    if raw_status in SUCCEEDED_STATUSES:
+        return Status.SUCCEEDED
+    elif raw_status in FAILED_STATUSES:
+        return Status.FAILED
+    return Status.PENDING
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed poll is worth trying again: dropped connections, timeouts, 408/409/429s and 5xxs.
+
+    Anything else, such as a 404 for a job that no longer exists or a 401 for
+    a revoked key, would fail the same way on every poll.
+    """
+    if isinstance(error, (APIConnectionError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    # Mistral's SDK errors carry the HTTP status as status_code
+    status_code = error.status_code if isinstance(error, APIStatusError) else getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code in (408, 409, 429) or status_code >= 500)
+
+@dataclass
+class JobSnapshot:
+    ft_id: str
+    raw_status: str
+    ft_name: Optional[str] = None
+
+    @property
+    def status(self) -> Status:
+        return to_status(self.raw_status)
+
+    @classmethod
+    def from_job(cls, job) -> "JobSnapshot":
+        return cls(ft_id=job.id, raw_status=str(job.status), ft_name=job.fine_tuned_model)
+
+class Watch:
+    """One fine-tuning job being tracked, shared by everyone waiting on it."""
+
+    def __init__(self, client: AsyncOpenAI | Mistral, ft_id: str, interval: float):
+        self.client = client
+        self.ft_id = ft_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.listeners: List[Callable[[JobSnapshot], None]] = []
+        self.snapshot: Optional[JobSnapshot] = None
+        self.interval = interval
+        self.next_poll = 0.0
+
+class FinetuneMonitor:
+    """Polls every outstanding fine-tuning job from one background task.
+
+    Each job is fetched at most once per tick. When several jobs are on the
+    same provider they are looked up together through its list endpoint, and only
+    jobs missing from the listing are retrieved one by one. A job is polled
+    every `min_interval` seconds while its status is changing and backs off
+    towards `max_interval` while it sits in the same status (e.g. during a long
+    training run). Waiters get a future that resolves with the final snapshot,
+    or fails with the error if polling the job fails in a way retrying won't
+    fix (see `is_transient`).
+    """
+
+    def __init__(self, min_interval: float = 2.0, max_interval: float = 60.0, backoff: float = 1.5, page_size: int = 100, max_list_pages: int = 3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.page_size = page_size
+        self.max_list_pages = max_list_pages
+        self.watches: Dict[str, Watch] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def watch(self, client: AsyncOpenAI | Mistral, ft_id: str, on_change: Optional[Callable[[JobSnapshot], None]] = None) -> asyncio.Future:
+        """Track ft_id until it finishes; on_change is called whenever its status changes."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Watches and the polling task belong to a loop; start over on a new one
+            self._loop = loop
+            self.watches = {}
+            self._task = None
+            self._wakeup = asyncio.Event()
+
+        watch = self.watches.get(ft_id)
+        if watch is None:
+            watch = Watch(client, ft_id, self.min_interval)
+            self.watches[ft_id] = watch
+        if on_change is not None:
+            watch.listeners.append(on_change)
+            if watch.snapshot is not None:
+                on_change(watch.snapshot)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return watch.future
+
+    async def wait(self, client: AsyncOpenAI | Mistral, ft_id: str, on_change: Optional[Callable[[JobSnapshot], None]] = None) -> JobSnapshot:
+        # Shield so that one cancelled waiter does not cancel the shared future
+        return await asyncio.shield(self.watch(client, ft_id, on_change))
+
+    async def _run(self):
+        while self.watches:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [watch for watch in self.watches.values() if watch.next_poll <= now]
+            if due:
+                await self._poll(due)
+            if not self.watches:
+                break
+            delay = min(watch.next_poll for watch in self.watches.values()) - time.monotonic()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, due: List[Watch]):
+        # Grouped by provider rather than client: any client of an account can list all of its jobs
+        groups: Dict[str, List[Watch]] = {}
+        for watch in self.watches.values():
+            groups.setdefault("openai" if isinstance(watch.client, AsyncOpenAI) else "mistral", []).append(watch)
+        due_ids = {watch.ft_id for watch in due}
+        await asyncio.gather(*(self._poll_group(watches, due_ids) for watches in groups.values()
+                               if any(watch.ft_id in due_ids for watch in watches)))
+
+    async def _poll_group(self, watches: List[Watch], due_ids: set):
+        """Poll the due jobs of one provider; a listing also refreshes the group's other jobs for free."""
+        client = watches[0].client
+        wanted = {watch.ft_id: watch for watch in watches}
+        snapshots: Dict[str, JobSnapshot] = {}
+        try:
+            if len(wanted) > 1:
+                snapshots = await self._list(client, set(wanted))
+            for ft_id in due_ids & wanted.keys() - snapshots.keys():
+                try:
+                    snapshots[ft_id] = await self.fetch(wanted[ft_id].client, ft_id)
+                except Exception as e:
+                    if is_transient(e):
+                        raise
+                    self._fail(wanted.pop(ft_id), e)
+        except Exception as e:
+            if not is_transient(e):
+                # The listing failed for good (e.g. a revoked key), so every job in the group would too
+                for watch in wanted.values():
+                    self._fail(watch, e)
+                return
+            print(f"Failed to poll fine-tuning jobs: {e}")
+
+        now = time.monotonic()
+        for ft_id, watch in wanted.items():
+            snapshot = snapshots.get(ft_id)
+            if snapshot is not None:
+                self._update(watch, snapshot)
+            elif ft_id in due_ids:
+                watch.interval = min(watch.interval * self.backoff, self.max_interval)
+            else:
+                continue
+            watch.next_poll = now + watch.interval
+
+    def _fail(self, watch: Watch, error: Exception):
+        print(f"Giving up on fine-tuning job {watch.ft_id}: {error}")
+        metrics.incr("finetune.monitor.failures")
+        self.watches.pop(watch.ft_id, None)
+        if not watch.future.done():
+            watch.future.set_exception(error)
+
+    def _update(self, watch: Watch, snapshot: JobSnapshot):
+        changed = watch.snapshot is None or watch.snapshot.raw_status != snapshot.raw_status
+        watch.snapshot = snapshot
+        if changed:
+            watch.interval = self.min_interval
+            for listener in watch.listeners:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    print(f"Fine-tuning status listener failed: {e}")
+        else:
+            watch.interval = min(watch.interval * self.backoff, self.max_interval)
+
+        if snapshot.status != Status.PENDING:
+            del self.watches[watch.ft_id]
+            if not watch.future.done():
+                watch.future.set_result(snapshot)
+
+    async def _list(self, client: AsyncOpenAI | Mistral, wanted: set) -> Dict[str, JobSnapshot]:
+        """Look up as many of the wanted jobs as possible through the list endpoint."""
+        found: Dict[str, JobSnapshot] = {}
+        if isinstance(client, AsyncOpenAI):
+            page = await client.fine_tuning.jobs.list(limit=self.page_size)
+            for page_number in range(self.max_list_pages):
+                metrics.incr("finetune.monitor.requests")
+                metrics.incr("finetune.monitor.list_requests")
+                found.update((job.id, JobSnapshot.from_job(job)) for job in page.data if job.id in wanted)
+                if wanted <= found.keys() or page_number + 1 == self.max_list_pages or not page.has_next_page():
+                    break
+                page = await page.get_next_page()
+        else:
+            for page_number in range(self.max_list_pages):
+                metrics.incr("finetune.monitor.requests")
+                metrics.incr("finetune.monitor.list_requests")
+                page = await client.fine_tuning.jobs.list_async(page=page_number, page_size=self.page_size)
+                found.update((job.id, JobSnapshot.from_job(job)) for job in page.data if job.id in wanted)
+                if wanted <= found.keys() or (page_number + 1) * self.page_size >= page.total:
+                    break
+        return found
+
+    async def fetch(self, client: AsyncOpenAI | Mistral, ft_id: str) -> JobSnapshot:
+        """Retrieve a single job."""
+        metrics.incr("finetune.monitor.requests")
+        metrics.incr("finetune.monitor.retrieve_requests")
+        if isinstance(client, AsyncOpenAI):
+            job = await client.fine_tuning.jobs.retrieve(ft_id)
+        else:
+            job = await client.fine_tuning.jobs.get_async(job_id=ft_id)
+        return JobSnapshot.from_job(job)
+
+_default_monitor: Optional[FinetuneMonitor] = None
+
+def default_finetune_monitor() -> FinetuneMonitor:
+    """The process-wide monitor, shared by every SmithModel."""
+    global _default_monitor
+    if _default_monitor is None:
+        _default_monitor = FinetuneMonitor(
+            min_interval=float(os.getenv("BLACKSMITH_FINETUNE_POLL_MIN", "2")),
+            max_interval=float(os.getenv("BLACKSMITH_FINETUNE_POLL_MAX", "60")),
+        )
+    return _default_monitor
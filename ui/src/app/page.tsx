@@ -3,9 +3,9 @@
 import { useState, useEffect, useRef } from 'react'
 import TypeWriter from '@/components/TypeWriter'
 import AnimatedResponse from '@/components/AnimatedResponse'
+import { base_url } from '@/services/api'
 
 // Define our responses
-const base_url = "https://4017-2001-5a8-450b-4900-9555-6b3a-f17f-92e.ngrok-free.app"
 const responses = [
   {
     header: "Deciding your model",
@@ -34,6 +34,7 @@ export default function Home() {
   const [currentResponseIndex, setCurrentResponseIndex] = useState(-1)
   const [responseVisible, setResponseVisible] = useState<boolean[]>([false, false, false, false])
   const inputRef = useRef<HTMLTextAreaElement>(null)
+  const jobIdRef = useRef<string | null>(null)
 
   useEffect(() => {
     if (inputRef.current) {
@@ -89,6 +90,7 @@ export default function Home() {
     })
     let response_json = JSON.parse(await response.json())
     console.log("Response json:", response_json)
+    jobIdRef.current = response_json.job_id
     responses[0].content = response_json.webscraping_prompt
     setCurrentResponseIndex(0); // Set this first to ensure component is visible
     setResponseVisible(prev => {
@@ -113,8 +115,11 @@ export default function Home() {
   const stages = {
     "parsing": 0,
     "scraping": 1,
+    "queued": 1,
     "finetuning": 2,
-    "deploying": 3
+    "deploying": 3,
+    "deployed": 3,
+    "failed": 3
   } as const;
 
   //now based on what the stage is, in pollstage we should manipulate that and set it to whatever the corresponding index is
@@ -123,7 +128,7 @@ export default function Home() {
     return new Promise((resolve) => {
       setTimeout(async () => {
         console.log("waited 5 seconds, fetching")
-        const response = await fetch(base_url + "/request_stage/", {
+        const response = await fetch(base_url + "/request_stage/" + jobIdRef.current, {
           method: 'GET',
         })
         let response_json = await response.json() as StageResponse
@@ -0,0 +1,70 @@
+export const base_url = "https://4017-2001-5a8-450b-4900-9555-6b3a-f17f-92e.ngrok-free.app"
+
+// Stream a chat completion from /completions/?stream=true, calling onToken as
+// each token arrives. Resolves with the full response text once the stream ends.
+export async function streamCompletion(
+  request: string,
+  onToken: (token: string) => void,
+  jobId?: string,
+): Promise<string> {
+  const params = new URLSearchParams({ request, stream: "true" })
+  if (jobId) {
+    params.set("job_id", jobId)
+  }
+  const response = await fetch(base_url + "/completions/?" + params.toString(), {
+    method: 'POST',
+  })
+  if (!response.ok || !response.body) {
+    throw new Error(`Completion request failed with status ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+  let text = ""
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) {
+      break
+    }
+    buffer += decoder.decode(value, { stream: true })
+    // Server-sent events are separated by a blank line
+    const events = buffer.split("\n\n")
+    buffer = events.pop() ?? ""
+    for (const event of events) {
+      const data = event.replace(/^data: /, "")
+      if (data === "[DONE]") {
+        return text
+      }
+      const payload = JSON.parse(data)
+      if (payload.error) {
+        throw new Error(payload.error)
+      }
+      text += payload.token
+      onToken(payload.token)
+    }
+  }
+  return text
+}
+
+export type StageEvent = {
+  job_id: string
+  stage: string
+  version: number
+  summary: string | null
+  detail: Record<string, unknown>
+}
+
+// Follow a job's progress from /request_stage/{jobId}/events instead of polling.
+// Returns a function that stops listening.
+export function subscribeStage(jobId: string, onEvent: (event: StageEvent) => void): () => void {
+  const source = new EventSource(base_url + "/request_stage/" + jobId + "/events")
+  source.onmessage = (message) => {
+    const event = JSON.parse(message.data) as StageEvent
+    onEvent(event)
+    if (event.stage === "deployed" || event.stage === "failed") {
+      source.close()
+    }
+  }
+  return () => source.close()
+}